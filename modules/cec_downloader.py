@@ -0,0 +1,320 @@
+import os
+import sys
+import json
+import requests
+import pandas as pd
+import numpy as np
+import sqlite3
+from io import BytesIO
+from datetime import datetime
+from openpyxl import load_workbook
+
+# Column and row dumps for debugging a changed sheet layout are only printed with -v/--verbose
+VERBOSE = '-v' in sys.argv or '--verbose' in sys.argv
+
+def name_header_row(values):
+    """
+    Turn a raw header row into column names the way pd.read_excel does:
+    blank cells become 'Unnamed: <i>' and repeated names get '.1', '.2', ... suffixes.
+    """
+    names = [f"Unnamed: {i}" if pd.isna(value) else value for i, value in enumerate(values)]
+    counts = {}
+    for i, name in enumerate(names):
+        count = counts.get(name, 0)
+        while count > 0:
+            counts[name] = count + 1
+            name = f"{name}.{count}"
+            count = counts.get(name, 0)
+        names[i] = name
+        counts[name] = count + 1
+    return names
+
+def read_raw_sheet(buffer):
+    """
+    Read the first sheet with no header row, using calamine when it is installed and
+    openpyxl's streaming read-only mode otherwise.
+    """
+    try:
+        return pd.read_excel(buffer, engine='calamine', header=None)
+    except ImportError:
+        buffer.seek(0)
+        wb = load_workbook(buffer, read_only=True, data_only=True)
+        try:
+            rows = list(wb.worksheets[0].iter_rows(values_only=True))
+        finally:
+            wb.close()
+        # openpyxl returns empty cells as None; use NaN like the calamine reader does
+        return pd.DataFrame(rows).fillna(np.nan)
+
+def fetch_excel(url, request_headers=None):
+    """
+    Stream a CEC equipment list into an in-memory buffer and return it with the response headers.
+    The buffer is None when the server answers a conditional request with 304 Not Modified.
+    """
+    excel_buffer = BytesIO()
+    with requests.Session() as session:
+        session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+        # Stream the body straight into the buffer instead of holding a second copy in response.content
+        with session.get(url, headers=request_headers, stream=True, timeout=30) as response:
+            if response.status_code == 304:
+                return None, response.headers
+            if response.status_code != 200:
+                raise Exception(f"Failed to download file: {response.status_code}")
+            for chunk in response.iter_content(chunk_size=1 << 16):
+                excel_buffer.write(chunk)
+    excel_buffer.seek(0)
+    return excel_buffer, response.headers
+
+def download_excel(url):
+    """
+    Download a CEC equipment list into an in-memory buffer.
+    """
+    excel_buffer, _ = fetch_excel(url)
+    return excel_buffer
+
+def download_excel_if_changed(url, cache_path, db_path, force=False):
+    """
+    Download a CEC equipment list unless it is unchanged since the last saved download.
+
+    The ETag/Last-Modified validators of that download are read from the JSON file at
+    cache_path and sent as If-None-Match/If-Modified-Since, as long as db_path still exists
+    and force is not set. Returns (buffer, validators); buffer is None when the server reports no change. Pass the
+    validators to save_download_validators() once the data has been stored.
+    """
+    request_headers = {}
+    if not force and os.path.exists(db_path) and os.path.exists(cache_path):
+        with open(cache_path) as f:
+            cached = json.load(f)
+        if cached.get('ETag'):
+            request_headers['If-None-Match'] = cached['ETag']
+        if cached.get('Last-Modified'):
+            request_headers['If-Modified-Since'] = cached['Last-Modified']
+
+    excel_buffer, response_headers = fetch_excel(url, request_headers)
+    validators = {key: response_headers[key] for key in ('ETag', 'Last-Modified') if key in response_headers}
+    return excel_buffer, validators
+
+def save_download_validators(cache_path, validators):
+    """
+    Remember the ETag/Last-Modified of a stored download for the next conditional request.
+    """
+    with open(cache_path, 'w') as f:
+        json.dump(validators, f)
+
+def read_sheet(excel_buffer, header_row, data_row, units_row=None):
+    """
+    Parse the sheet once without a header and slice the header, units and data rows out of it.
+    Row numbers are 0-indexed; when a units row is given, each unit is appended to its column
+    name as "<name> (<unit>)".
+    """
+    raw = read_raw_sheet(excel_buffer)
+    headers = name_header_row(raw.iloc[header_row])
+
+    df = raw.iloc[data_row:].reset_index(drop=True).infer_objects()
+
+    if units_row is None:
+        df.columns = headers
+        return df
+
+    # Append the non-blank units to their column names in one vectorized pass
+    names = pd.Series(headers, dtype=object)
+    units = raw.iloc[units_row].reset_index(drop=True).astype('string')
+    has_unit = units.notna() & (units.str.strip() != "")
+    with_units = names.astype(str) + " (" + units.fillna("") + ")"
+    df.columns = names.where(~has_unit, with_units).tolist()
+    return df
+
+def sanitize_for_sqlite(df):
+    """
+    Replace NaN/NaT with None and format Timestamps as strings so every value binds to SQLite.
+    """
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].dt.strftime('%Y-%m-%d %H:%M:%S').where(df[col].notna(), None)
+        else:
+            df[col] = df[col].where(df[col].notna(), None)
+            # Mixed object columns can still hold individual Timestamps
+            if df[col].dtype == object:
+                is_timestamp = df[col].map(type) == pd.Timestamp
+                if is_timestamp.any():
+                    df.loc[is_timestamp, col] = pd.to_datetime(df.loc[is_timestamp, col]).dt.strftime('%Y-%m-%d %H:%M:%S')
+    return df
+
+def connect_for_bulk_load(db_path):
+    """
+    Open db_path for loading a CEC download. The connection is in autocommit mode, so the
+    sqlite3 module never opens transactions on its own; the caller's BEGIN is the only one
+    and the with-block commits it once at the end.
+
+    Bulk-load settings: WAL journal with synchronous=NORMAL (commits don't wait for an fsync,
+    and a crash can only lose the last load, not corrupt tables kept across runs), temp
+    structures in memory, a 64 MB page cache and a memory-mapped file.
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-65536")
+    conn.execute("PRAGMA mmap_size=268435456")
+    return conn
+
+def upsert_table(df, db_path, table, pk, numeric_columns=(), delete_missing=False):
+    """
+    Write df into table, keyed on the pk column, in a single transaction.
+
+    The table is created if missing and only dropped and recreated when its structure
+    differs from df's columns; rows are then upserted through the primary key. With
+    delete_missing, rows whose key isn't in df (models dropped from the CEC list) are removed.
+    """
+    with connect_for_bulk_load(db_path) as conn:
+        cursor = conn.cursor()
+
+        # Run the whole load in one transaction
+        conn.execute("BEGIN")
+
+        # Column definitions with pk as primary key, as (name, type, pk) tuples
+        columns = df.columns
+        column_defs = []
+        for col in columns:
+            if col == pk:
+                column_defs.append((col, 'TEXT', 1))
+            elif col in numeric_columns:
+                column_defs.append((col, 'REAL', 0))
+            else:
+                column_defs.append((col, 'TEXT', 0))
+
+        # Check the existing table against those definitions; only a table with a different
+        # structure (or one without the primary key) is dropped and recreated. Column order
+        # doesn't matter since the upsert names every column.
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing_defs = [(row[1], row[2], row[5]) for row in cursor.fetchall()]
+        if existing_defs and sorted(existing_defs) != sorted(column_defs):
+            cursor.execute(f"DROP TABLE {table}")
+            print("Dropping existing table to create it with the correct columns.")
+
+        columns_str = ', '.join(
+            f'"{col}" {col_type} PRIMARY KEY' if is_pk else f'"{col}" {col_type}'
+            for col, col_type, is_pk in column_defs
+        )
+        cursor.execute(f'CREATE TABLE IF NOT EXISTS {table} ({columns_str});')
+
+        # Upsert every row in one statement, letting SQLite decide between insert and update
+        # through the primary key
+        columns_sql = ', '.join(f'"{col}"' for col in columns)
+        placeholders = ', '.join('?' * len(columns))
+        update_parts = ', '.join(f'"{col}" = excluded."{col}"' for col in columns if col != pk)
+        upsert_query = (
+            f'INSERT INTO {table} ({columns_sql}) VALUES ({placeholders}) '
+            f'ON CONFLICT({pk}) DO UPDATE SET {update_parts}'
+        )
+        # Materialize the rows in one pass; after sanitizing, the object array holds plain Python values
+        rows = df[columns].to_numpy(dtype=object).tolist()
+        try:
+            rows_before = cursor.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            cursor.executemany(upsert_query, rows)
+            upserted = cursor.rowcount
+            inserted = cursor.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] - rows_before
+            print(f"Inserted {inserted} new rows.")
+            print(f"Updated {upserted - inserted} existing rows.")
+
+            if delete_missing:
+                # Collect this download's keys in a temp table and drop every row not among them
+                cursor.execute(f'CREATE TEMP TABLE current_keys ("{pk}" TEXT PRIMARY KEY)')
+                cursor.executemany('INSERT OR IGNORE INTO current_keys VALUES (?)', ((key,) for key in df[pk]))
+                cursor.execute(f'DELETE FROM {table} WHERE "{pk}" NOT IN (SELECT "{pk}" FROM current_keys)')
+                print(f"Removed {cursor.rowcount} rows no longer on the list.")
+                cursor.execute('DROP TABLE current_keys')
+        except sqlite3.Error as e:
+            # Re-raise so the load is rolled back and the caller doesn't record it as stored
+            print(f"Error inserting data: {e}")
+            raise
+
+        # Connection will be automatically committed and closed by the context manager
+
+def create_indexes(db_path, table, columns):
+    """
+    Index the given columns (index role -> column name) as idx_<table>_<role>. Run it after the
+    rows are loaded, so a fresh table is filled before its indexes are built.
+    """
+    with sqlite3.connect(db_path) as conn:
+        for role, column in columns.items():
+            conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_{role} ON {table} ("{column}")')
+    print(f"Indexed {', '.join(columns.values())}.")
+
+def write_parquet_snapshot(db_path, table, parquet_path):
+    """
+    Save a columnar snapshot of the table so the app can reload it without SQLite.
+
+    The snapshot is written to a temporary file and swapped into place, so the app never reads
+    a partly written one. If it can't be written, the old snapshot no longer matches the
+    database and is removed, and the app reads the database instead.
+    """
+    tmp_path = parquet_path + '.tmp'
+    try:
+        with sqlite3.connect(db_path) as conn:
+            df = pd.read_sql_query(f"SELECT * FROM {table}", conn)
+        df.to_parquet(tmp_path, compression='zstd', index=False)
+        os.replace(tmp_path, parquet_path)
+        print(f"Saved Parquet snapshot to {parquet_path}.")
+    except Exception as e:
+        for path in (tmp_path, parquet_path):
+            if os.path.exists(path):
+                os.remove(path)
+        print(f"Skipping Parquet snapshot: {e}")
+
+def ingest(url, header_row, data_row, db_path, table, pk, id_columns,
+           units_row=None, column_map=None, numeric_columns=(), parquet_path=None, delete_missing=False,
+           indexed_columns=None):
+    """
+    Download a CEC equipment list and load it into a SQLite table.
+
+    column_map, if given, maps output column names to sheet column positions and replaces
+    the sheet's own columns. The pk column is built as "<id_columns[0]>_<id_columns[1]>".
+    delete_missing is passed on to upsert_table(); indexed_columns, if given, to create_indexes().
+    """
+    # Step 1: Download the Excel file
+    excel_buffer = download_excel(url)
+
+    # Step 2: Load the Excel file into a pandas DataFrame
+    df = read_sheet(excel_buffer, header_row, data_row, units_row)
+
+    # Print column names to debug
+    if VERBOSE:
+        print("Available columns:")
+        for i, col in enumerate(df.columns):
+            print(f"{i}: {col}")
+
+    # Keep only the mapped columns, under their standardized names
+    if column_map is not None:
+        df = pd.DataFrame({name: df.iloc[:, position] for name, position in column_map.items()})
+
+    # Store the numeric columns as numbers so SQLite keeps them as REAL instead of TEXT
+    for col in numeric_columns:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    # Step 3: Create a unique identifier for each row
+    # Convert to string first to handle any numeric values (na_rep keeps the old 'nan' spelling for blanks)
+    first, second = id_columns
+    df[pk] = df[first].astype('string').str.cat(df[second].astype('string'), sep='_', na_rep='nan')
+
+    # Step 4: Add a timestamp for when the data was added to the tool
+    df['Date Added to Tool'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    # Step 5: Write the rows to SQLite
+    sanitize_for_sqlite(df)
+    upsert_table(df, db_path, table, pk, numeric_columns, delete_missing)
+    if indexed_columns:
+        create_indexes(db_path, table, indexed_columns)
+
+    # Step 6: Optionally save a Parquet snapshot next to the database
+    if parquet_path is not None:
+        write_parquet_snapshot(db_path, table, parquet_path)
+
+    print(f"Total rows: {len(df)}")
+    print(f"Total columns: {len(df.columns)}")
+    if VERBOSE:
+        print("\nFirst 5 column names:")
+        for i, col in enumerate(df.columns[:5]):
+            print(f"{i+1}. {col}")
+    return df
@@ -1,205 +1,182 @@
-import requests
+import os
 import pandas as pd
 import sqlite3
-from io import BytesIO
-from datetime import datetime
 import re
+from cec_downloader import (
+    VERBOSE, connect_for_bulk_load, create_indexes, download_excel, sanitize_for_sqlite, write_parquet_snapshot,
+)
 
-def parse_date_to_standard_format(date_value):
+# Date shapes that parse with an exact format instead of per-value inference
+YMD_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}')
+YM_PATTERN = re.compile(r'\d{4}-\d{1,2}')
+
+def parse_dates_to_standard_format(values):
     """
-    Parse various date formats and convert to YYYY-MM-DD format.
+    Parse a column of mixed date values and convert to YYYY-MM-DD format.
     Handles:
     - Unix timestamps (e.g., 1508137200)
     - YYYY-M format (e.g., 2017-9)
     - Already formatted YYYY-MM-DD dates
     - Pandas datetime and Timestamp objects
+    Values that cannot be parsed are returned as None.
     """
-    if pd.isna(date_value) or date_value == '' or date_value is None:
-        return None
-    
-    # Handle pandas datetime and Timestamp objects
-    if isinstance(date_value, (pd.Timestamp, datetime)):
-        return date_value.strftime('%Y-%m-%d')
-    
-    date_str = str(date_value).strip()
-    
     # Handle Unix timestamps (numeric values with 10 digits)
-    if date_str.isdigit() and len(date_str) == 10:
-        try:
-            return datetime.fromtimestamp(int(date_str)).strftime('%Y-%m-%d')
-        except (ValueError, OSError):
-            return None
-    
-    # Handle YYYY-M format (e.g., "2017-9")
-    if re.match(r'^\d{4}-\d{1,2}$', date_str):
-        try:
-            # Add day as 01 to make it a valid date
-            year, month = date_str.split('-')
-            return f"{year}-{month.zfill(2)}-01"
-        except ValueError:
-            return None
-    
-    # Handle YYYY-MM-DD format (already correct)
-    if re.match(r'^\d{4}-\d{2}-\d{2}$', date_str):
-        return date_str
-    
-    # Handle other potential formats
-    try:
-        # Try to parse as a general date
-        parsed_date = pd.to_datetime(date_str, errors='coerce')
-        if pd.notna(parsed_date):
-            return parsed_date.strftime('%Y-%m-%d')
-    except:
-        pass
-    
-    return None
-
-# Step 1: Download the Excel file
-url = 'https://solarequipment.energy.ca.gov/Home/DownloadtoExcel?filename=MeterList'
-response = requests.get(url)
-if response.status_code != 200:
-    raise Exception(f"Failed to download file: {response.status_code}")
-
-# Step 2: Load the Excel file into a pandas DataFrame
-# Headers are on row 8 (0-indexed, so this is the 9th row)
-# Data starts from row 9 (0-indexed, so this is the 10th row)
-excel_data = BytesIO(response.content)
-df_headers = pd.read_excel(excel_data, engine='openpyxl', header=7, nrows=1)
-excel_data.seek(0)  # Reset the file pointer
-
-# Get the actual data starting from row 9 (0-indexed, so this is the 10th row)
-df = pd.read_excel(excel_data, engine='openpyxl', header=7, skiprows=1)
-
-# Print column names to debug
-print("Available columns:")
-for i, col in enumerate(df.columns):
-    print(f"{i}: {col}")
-
-# Print the first row's values to debug
-print("\nFirst row values:")
-for i, val in enumerate(df.iloc[0]):
-    print(f"{i}: {val}")
-
-# Define the current time for the timestamp
-current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-# Create a new DataFrame with only the columns we need
-new_df = pd.DataFrame()
-
-try:
-    # Map columns according to the Excel structure provided by the user
-    # Column A: Manufacturer Name
-    new_df['Manufacturer'] = df.iloc[:, 0]
-    
-    # Column B: Model Number
-    new_df['Model Number'] = df.iloc[:, 1]
-    
-    # Column C: Display Type
-    new_df['Display Type'] = df.iloc[:, 2]
-    
-    # Column D: PBI Meter
-    new_df['PBI Meter'] = df.iloc[:, 3]
-    
-    # Column E: Note
-    new_df['Note'] = df.iloc[:, 4]
-    
-    # Column I: CEC Listing Date - Convert to standardized YYYY-MM-DD format
-    new_df['Meter Listing Date'] = df.iloc[:, 8].apply(parse_date_to_standard_format)
-    
-    # Column J: Last Update - Convert to standardized YYYY-MM-DD format
-    new_df['Last Update'] = df.iloc[:, 9].apply(parse_date_to_standard_format)
-    
-    # Add the Date Added to Tool column
-    new_df['Date Added to Tool'] = current_time
-    
-    # Create a unique identifier for each meter
-    new_df['meter_id'] = new_df['Manufacturer'].astype(str) + '_' + new_df['Model Number'].astype(str)
-    
-    # Print the columns in our new DataFrame
-    print("\nNew DataFrame columns:")
-    for col in new_df.columns:
-        print(f"- {col}")
-    
-    # Replace the original DataFrame with our new one
-    df = new_df
-    
-except Exception as e:
-    print(f"Error mapping columns: {e}")
-    # If we encounter an error, we'll create a minimal DataFrame with just the essential columns
-    new_df = pd.DataFrame()
-    new_df['Manufacturer'] = df.iloc[:, 0]  # Column A: Manufacturer Name
-    new_df['Model Number'] = df.iloc[:, 1]  # Column B: Model Number
-    new_df['Display Type'] = df.iloc[:, 2]  # Column C: Display Type
-    new_df['PBI Meter'] = df.iloc[:, 3]  # Column D: PBI Meter
-    new_df['Note'] = df.iloc[:, 4]  # Column E: Note
-    # Column I: CEC Listing Date - Convert to standardized YYYY-MM-DD format
-    new_df['Meter Listing Date'] = df.iloc[:, 8].apply(parse_date_to_standard_format)
-    
-    # Column J: Last Update - Convert to standardized YYYY-MM-DD format
-    new_df['Last Update'] = df.iloc[:, 9].apply(parse_date_to_standard_format)
-    new_df['Date Added to Tool'] = current_time
-    new_df['meter_id'] = new_df['Manufacturer'].astype(str) + '_' + new_df['Model Number'].astype(str)
-    df = new_df
-    print("Created minimal DataFrame due to error")
-
-# Step 5: Connect to SQLite database (or create it) using context manager
-with sqlite3.connect('meters.db') as conn:
-    cursor = conn.cursor()
-
-    # Step 6: Check if the table exists, if not create it with a primary key
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='meters'")
-    table_exists = cursor.fetchone() is not None
-
-    # We're going to drop and recreate the table to ensure it has the correct structure
-    if table_exists:
-        cursor.execute("DROP TABLE meters")
-        print("Dropping existing table to create it with the correct columns.")
-    
-    # Handle NaT values and Timestamp objects in the dataframe before insertion
-    for col in df.columns:
-        df[col] = df[col].apply(lambda x: None if pd.isna(x) or str(x) == 'NaT' 
-                              else x.strftime('%Y-%m-%d %H:%M:%S') if isinstance(x, pd.Timestamp) 
-                              else x)
-    
-    # Create the table with meter_id as primary key
-    columns = df.columns
-    column_defs = []
-    for col in columns:
-        if col == 'meter_id':
-            column_defs.append(f'"{col}" TEXT PRIMARY KEY')
-        else:
-            column_defs.append(f'"{col}" TEXT')
-    
-    columns_str = ', '.join(column_defs)
-    create_table_query = f'CREATE TABLE IF NOT EXISTS meters ({columns_str});'
-    print(f"Creating table with columns: {columns_str}")
-    cursor.execute(create_table_query)
-    
-    # Insert all data - use try/except to handle any integrity errors
+    numeric = pd.to_numeric(values, errors='coerce')
+    is_unix = numeric.between(1e9, 2e10)
+    parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    parsed[is_unix] = pd.to_datetime(numeric[is_unix].astype('int64'), unit='s')
+
+    # Classify the remaining strings once, then parse each shape in bulk
+    text = values[~is_unix & values.notna()].astype(str).str.strip()
+    is_ymd = text.str.fullmatch(YMD_PATTERN)
+    is_ym = text.str.fullmatch(YM_PATTERN)
+    parsed[text.index[is_ymd]] = pd.to_datetime(text[is_ymd], errors='coerce', format='%Y-%m-%d')
+    parsed[text.index[is_ym]] = pd.to_datetime(text[is_ym], errors='coerce', format='%Y-%m')
+
+    # Anything else (datetimes, other formats) falls back to per-value inference
+    rest = text[~(is_ymd | is_ym)]
+    parsed[rest.index] = pd.to_datetime(rest, errors='coerce', format='mixed')
+
+    return parsed.dt.strftime('%Y-%m-%d').where(parsed.notna(), None)
+
+# The database and its Parquet snapshot are written into data_dir
+def main(data_dir='.'):
+    db_path = os.path.join(data_dir, 'meters.db')
+
+    # Step 1: Download the Excel file
+    url = 'https://solarequipment.energy.ca.gov/Home/DownloadtoExcel?filename=MeterList'
+    excel_buffer = download_excel(url)
+
+    # Step 2: Load the Excel file into a pandas DataFrame
+    # Headers are on row 8 (0-indexed, so this is the 9th row)
+    # Data starts from row 9 (0-indexed, so this is the 10th row)
+    # calamine (Rust) parses the workbook in a single pass, much faster than openpyxl
+    df = pd.read_excel(excel_buffer, engine='calamine', header=7, skiprows=1)
+
+    if VERBOSE:
+        # Print column names to debug
+        print("Available columns:")
+        for i, col in enumerate(df.columns):
+            print(f"{i}: {col}")
+
+        # Print the first row's values to debug
+        print("\nFirst row values:")
+        for i, val in enumerate(df.iloc[0]):
+            print(f"{i}: {val}")
+
+    # Define the current time for the timestamp
+    current_time = pd.Timestamp.now().isoformat(sep=' ', timespec='seconds')
+
     try:
-        # First try with if_exists='replace' to ensure we have a clean table
-        df.to_sql('meters', conn, if_exists='replace', index=False)
-        print(f"Created new table and inserted {len(df)} rows.")
+        # Map columns according to the Excel structure provided by the user
+        # Columns A-E (Manufacturer Name, Model Number, Display Type, PBI Meter, Note),
+        # I (CEC Listing Date) and J (Last Update), taken in a single slice
+        new_df = df.iloc[:, [0, 1, 2, 3, 4, 8, 9]].copy()
+        new_df.columns = ['Manufacturer', 'Model Number', 'Display Type', 'PBI Meter', 'Note', 'Meter Listing Date', 'Last Update']
+
+        # Convert both date columns to standardized YYYY-MM-DD format
+        new_df['Meter Listing Date'] = parse_dates_to_standard_format(new_df['Meter Listing Date'])
+        new_df['Last Update'] = parse_dates_to_standard_format(new_df['Last Update'])
+
+        # Add the Date Added to Tool column as a one-category column rather than N object pointers
+        new_df['Date Added to Tool'] = pd.Series(current_time, index=new_df.index, dtype='category')
+
+        # Create a unique identifier for each meter (na_rep keeps the old 'nan' spelling for blanks)
+        new_df['meter_id'] = new_df['Manufacturer'].astype('string').str.cat(new_df['Model Number'].astype('string'), sep='_', na_rep='nan')
+
+        # Print the columns in our new DataFrame
+        if VERBOSE:
+            print("\nNew DataFrame columns:")
+            for col in new_df.columns:
+                print(f"- {col}")
+
+        # Replace the original DataFrame with our new one
+        df = new_df
+
     except Exception as e:
-        print(f"Error inserting data: {e}")
-        # If we get errors, try inserting one by one
-        print("Trying to insert rows one by one...")
-        inserted = 0
-        for _, row in df.iterrows():
-            try:
-                pd.DataFrame([row]).to_sql('meters', conn, if_exists='append', index=False)
-                inserted += 1
-            except Exception as e:
-                print(f"Error inserting row: {e}")
-                # Skip problematic rows
-                pass
-        print(f"Inserted {inserted} rows out of {len(df)}.")
-    
-    # Connection will be automatically committed and closed by the context manager
-
-print("Meter data has been successfully downloaded and stored in the database.")
-print(f"Total rows: {len(df)}")
-print(f"Total columns: {len(df.columns)}")
-print("\nFirst 5 column names:")
-for i, col in enumerate(df.columns[:5]):
-    print(f"{i+1}. {col}")
+        print(f"Error mapping columns: {e}")
+        # If we encounter an error, we'll create a minimal DataFrame with just the essential columns
+        new_df = pd.DataFrame()
+        new_df['Manufacturer'] = df.iloc[:, 0]  # Column A: Manufacturer Name
+        new_df['Model Number'] = df.iloc[:, 1]  # Column B: Model Number
+        new_df['Display Type'] = df.iloc[:, 2]  # Column C: Display Type
+        new_df['PBI Meter'] = df.iloc[:, 3]  # Column D: PBI Meter
+        new_df['Note'] = df.iloc[:, 4]  # Column E: Note
+        # Column I: CEC Listing Date - Convert to standardized YYYY-MM-DD format
+        new_df['Meter Listing Date'] = parse_dates_to_standard_format(df.iloc[:, 8])
+
+        # Column J: Last Update - Convert to standardized YYYY-MM-DD format
+        new_df['Last Update'] = parse_dates_to_standard_format(df.iloc[:, 9])
+        new_df['Date Added to Tool'] = current_time
+        new_df['meter_id'] = new_df['Manufacturer'].astype('string').str.cat(new_df['Model Number'].astype('string'), sep='_', na_rep='nan')
+        df = new_df
+        print("Created minimal DataFrame due to error")
+
+    # Step 5: Connect to SQLite database (or create it) using context manager
+    with connect_for_bulk_load(db_path) as conn:
+        cursor = conn.cursor()
+
+        # Rebuild the table in one transaction, so a failed insert leaves the previous table in place
+        conn.execute("BEGIN")
+
+        # Step 6: Check if the table exists, if not create it with a primary key
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='meters'")
+        table_exists = cursor.fetchone() is not None
+
+        # We're going to drop and recreate the table to ensure it has the correct structure
+        if table_exists:
+            cursor.execute("DROP TABLE meters")
+            print("Dropping existing table to create it with the correct columns.")
+
+        # Handle NaT values and Timestamp objects in the dataframe before insertion
+        sanitize_for_sqlite(df)
+
+        # Create the table with meter_id as primary key; WITHOUT ROWID stores rows in the
+        # meter_id B-tree itself instead of a rowid table plus a separate key index
+        columns = df.columns
+        column_defs = []
+        for col in columns:
+            if col == 'meter_id':
+                column_defs.append(f'"{col}" TEXT PRIMARY KEY')
+            else:
+                column_defs.append(f'"{col}" TEXT')
+
+        columns_str = ', '.join(column_defs)
+        create_table_query = f'CREATE TABLE IF NOT EXISTS meters ({columns_str}) WITHOUT ROWID;'
+        if VERBOSE:
+            print(f"Creating table with columns: {columns_str}")
+        cursor.execute(create_table_query)
+
+        # Insert all rows with one prepared statement
+        columns_sql = ', '.join(f'"{col}"' for col in columns)
+        placeholders = ', '.join('?' * len(columns))
+        insert_query = f'INSERT OR REPLACE INTO meters ({columns_sql}) VALUES ({placeholders})'
+        rows = df[columns].to_numpy(dtype=object).tolist()
+        try:
+            cursor.executemany(insert_query, rows)
+            conn.commit()
+            print(f"Created new table and inserted {len(df)} rows.")
+        except sqlite3.Error as e:
+            # Keep the previous table and re-raise, so the refresh is reported as failed
+            conn.rollback()
+            print(f"Error inserting data: {e}")
+            raise
+
+        # Connection will be automatically committed and closed by the context manager
+
+    # Index the columns the explorer filters and sorts by
+    create_indexes(db_path, 'meters', {'manufacturer': 'Manufacturer', 'listing_date': 'Meter Listing Date'})
+
+    # Step 7: Save a columnar snapshot of the table so the app can reload it without SQLite
+    write_parquet_snapshot(db_path, 'meters', os.path.join(data_dir, 'meters.parquet'))
+
+    print("Meter data has been successfully downloaded and stored in the database.")
+    print(f"Total rows: {len(df)}")
+    print(f"Total columns: {len(df.columns)}")
+    if VERBOSE:
+        print("\nFirst 5 column names:")
+        for i, col in enumerate(df.columns[:5]):
+            print(f"{i+1}. {col}")
+
+if __name__ == "__main__":
+    main()
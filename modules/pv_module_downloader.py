@@ -1,169 +1,144 @@
-import requests
-import pandas as pd
+import os
 import sqlite3
-from io import BytesIO
-from datetime import datetime
-
-# Step 1: Download the Excel file
-url = 'https://solarequipment.energy.ca.gov/Home/DownloadtoExcel?filename=PVModuleList'
-response = requests.get(url)
-if response.status_code != 200:
-    raise Exception(f"Failed to download file: {response.status_code}")
-
-# Step 2: Load the Excel file into a pandas DataFrame
-# Skip to row 16 (0-indexed, so this is the 17th row) for headers
-# And use row 17 (0-indexed, so this is the 18th row) for units
-excel_data = BytesIO(response.content)
-df_headers = pd.read_excel(excel_data, engine='openpyxl', header=16, nrows=1)
-excel_data.seek(0)  # Reset the file pointer
-df_units = pd.read_excel(excel_data, engine='openpyxl', header=None, skiprows=17, nrows=1)
-
-# Get the actual data starting from row 18 (0-indexed, so this is the 19th row)
-excel_data.seek(0)  # Reset the file pointer
-df = pd.read_excel(excel_data, engine='openpyxl', header=16, skiprows=2)
-
-# Combine column names with units
-column_names = []
-for i, col in enumerate(df_headers.columns):
-    unit = df_units.iloc[0, i] if i < len(df_units.columns) else ""
-    if pd.notna(unit) and str(unit).strip() != "":
-        column_names.append(f"{col} ({unit})")
-    else:
-        column_names.append(col)
-
-df.columns = column_names
-
-# Step 3: Create a unique identifier for each module
-# We'll use a combination of Manufacturer and Model Number
-# Convert to string first to handle any numeric values
-df['module_id'] = df['Manufacturer'].astype(str) + '_' + df['Model Number'].astype(str)
-
-# Step 4: Add a timestamp for when the data was added to the tool
-current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-df['Date Added to Tool'] = current_time
-
-# Step 5: Connect to SQLite database (or create it) using context manager
-with sqlite3.connect('pv_modules.db') as conn:
-    cursor = conn.cursor()
-
-    # Step 6: Check if the table exists, if not create it with a primary key
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='pv_modules'")
-    table_exists = cursor.fetchone() is not None
-
-    # Also check if module_id column exists in the table
-    module_id_exists = False
-    if table_exists:
-        try:
-            cursor.execute("SELECT module_id FROM pv_modules LIMIT 1")
-            module_id_exists = True
-        except sqlite3.OperationalError:
-            # module_id column doesn't exist, we'll need to recreate the table
-            module_id_exists = False
-
-    if not table_exists or not module_id_exists:
-        # If table doesn't exist or doesn't have module_id, drop it and recreate
-        if table_exists:
-            cursor.execute("DROP TABLE pv_modules")
-            print("Dropping existing table to add primary key and Date Added to Tool column.")
-        
-        # Create the table with module_id as primary key
-        columns = df.columns
-        column_defs = []
-        for col in columns:
-            if col == 'module_id':
-                column_defs.append(f'"{col}" TEXT PRIMARY KEY')
-            else:
-                column_defs.append(f'"{col}" TEXT')
-        
-        columns_str = ', '.join(column_defs)
-        create_table_query = f'CREATE TABLE IF NOT EXISTS pv_modules ({columns_str});'
+from cec_downloader import (
+    VERBOSE, connect_for_bulk_load, create_indexes, download_excel_if_changed, read_sheet,
+    sanitize_for_sqlite, save_download_validators, write_parquet_snapshot,
+)
+
+# SQLite column type for each pandas dtype; everything else (strings, formatted dates) is TEXT
+SQL_TYPES = {'int64': 'INTEGER', 'float64': 'REAL', 'bool': 'INTEGER'}
+
+# Local time in the same format the other tables use for "Date Added to Tool"
+DATE_ADDED_SQL = "strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime')"
+
+# Layout version of the pv_modules table, kept in the database's user_version;
+# bump it whenever the table definition changes so existing databases are rebuilt
+SCHEMA_VERSION = 1
+
+# The database, its Parquet snapshot and the download validators are written into data_dir
+def main(data_dir='.'):
+    db_path = os.path.join(data_dir, 'pv_modules.db')
+    cache_path = os.path.join(data_dir, 'pv_modules.cache.json')
+
+    # Step 1: Download the Excel file
+    # Skip everything when the CEC list hasn't changed since the last stored download
+    # A database written for an older schema version has to be rebuilt from a full download,
+    # so the stored validators are only sent once it is at the current version
+    url = 'https://solarequipment.energy.ca.gov/Home/DownloadtoExcel?filename=PVModuleList'
+    schema_version = 0
+    if os.path.exists(db_path):
+        conn = sqlite3.connect(db_path)
+        schema_version = conn.execute("PRAGMA user_version").fetchone()[0]
+        conn.close()
+    excel_buffer, validators = download_excel_if_changed(
+        url, cache_path, db_path, force=schema_version < SCHEMA_VERSION
+    )
+    if excel_buffer is None:
+        print("PV module list is unchanged since the last download; keeping the existing database.")
+        return
+
+    # Step 2: Load the Excel file into a pandas DataFrame
+    # Headers are on row 16 (0-indexed, so this is the 17th row) and units on row 17;
+    # the data starts on row 19 (0-indexed, so this is the 20th row)
+    # The workbook is parsed once and the header, units and data rows are sliced out of it
+    df = read_sheet(excel_buffer, header_row=16, data_row=19, units_row=17)
+
+    # Step 3: Create a unique identifier for each module
+    # We'll use a combination of Manufacturer and Model Number
+    # Convert to string first to handle any numeric values (na_rep keeps the old 'nan' spelling for blanks)
+    df['module_id'] = df['Manufacturer'].astype('string').str.cat(df['Model Number'].astype('string'), sep='_', na_rep='nan')
+
+    # Step 4: The timestamp for when the data was added to the tool is filled in by SQLite:
+    # the column DEFAULT on insert and the same expression on update, instead of a copy per row
+
+    # Handle NaT values and Timestamp objects in the dataframe before insertion
+    sanitize_for_sqlite(df)
+
+    # Build the SQL once from the final columns so every row reuses the same prepared statement.
+    # Store numbers as INTEGER/REAL rather than TEXT, following the pandas dtypes,
+    # as (name, type, default) tuples
+    column_types = [(col, 'TEXT' if col == 'module_id' else SQL_TYPES.get(str(df[col].dtype), 'TEXT'), None)
+                    for col in df.columns]
+    column_types.append(('Date Added to Tool', 'TEXT', DATE_ADDED_SQL))
+
+    # Table definition with module_id as primary key
+    column_defs = []
+    for col, col_type, default in column_types:
+        if col == 'module_id':
+            column_defs.append(f'"{col}" TEXT PRIMARY KEY')
+        elif default is not None:
+            column_defs.append(f'"{col}" {col_type} DEFAULT ({default})')
+        else:
+            column_defs.append(f'"{col}" {col_type}')
+    create_table_query = f'CREATE TABLE IF NOT EXISTS pv_modules ({", ".join(column_defs)});'
+
+    columns_sql = ', '.join(f'"{col}"' for col in df.columns)
+    placeholders = ', '.join('?' * len(df.columns))
+    update_parts = ', '.join(f'"{col}" = excluded."{col}"' for col in df.columns if col != 'module_id')
+    update_parts += f', "Date Added to Tool" = {DATE_ADDED_SQL}'
+    upsert_query = (
+        f'INSERT INTO pv_modules ({columns_sql}) VALUES ({placeholders}) '
+        f'ON CONFLICT(module_id) DO UPDATE SET {update_parts}'
+    )
+
+    # Step 5: Connect to SQLite database (or create it) using context manager
+    with connect_for_bulk_load(db_path) as conn:
+        cursor = conn.cursor()
+
+        # Run the whole load in one transaction
+        conn.execute("BEGIN")
+
+        # Step 6: Rebuild the table when it was written by an older version of this script (e.g.
+        # without the DEFAULT on Date Added to Tool), or when its columns no longer match this
+        # download: CEC added or removed a column, or a column's values changed type. Otherwise
+        # go straight to the upsert; column order doesn't matter since the upsert names every column
+        schema_version = conn.execute("PRAGMA user_version").fetchone()[0]
+        expected_defs = sorted((col, col_type, int(col == 'module_id')) for col, col_type, _ in column_types)
+        existing_defs = sorted((row[1], row[2], row[5]) for row in cursor.execute("PRAGMA table_info(pv_modules)"))
+        if schema_version < SCHEMA_VERSION or (existing_defs and existing_defs != expected_defs):
+            cursor.execute("DROP TABLE IF EXISTS pv_modules")
+            print(f"Creating the pv_modules table for schema version {SCHEMA_VERSION} with the current columns.")
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
         cursor.execute(create_table_query)
-        
-        # Handle NaT values and Timestamp objects in the dataframe before insertion
-        for col in df.columns:
-            df[col] = df[col].apply(lambda x: None if pd.isna(x) or str(x) == 'NaT' 
-                                  else x.strftime('%Y-%m-%d %H:%M:%S') if isinstance(x, pd.Timestamp) 
-                                  else x)
-        
-        # Insert all data - use try/except to handle any integrity errors
+
+        # New and existing tables take the same upsert path
         try:
-            # First try with if_exists='append'
-            df.to_sql('pv_modules', conn, if_exists='append', index=False)
-            print(f"Created new table and inserted {len(df)} rows.")
-        except sqlite3.IntegrityError:
-            # If we get integrity errors, try inserting one by one
-            print("Handling duplicate primary keys...")
-            inserted = 0
-            for _, row in df.iterrows():
-                try:
-                    pd.DataFrame([row]).to_sql('pv_modules', conn, if_exists='append', index=False)
-                    inserted += 1
-                except sqlite3.IntegrityError:
-                    # Skip duplicates
-                    pass
-            print(f"Inserted {inserted} rows, skipped {len(df) - inserted} duplicates.")
-        except Exception as e:
+            rows_before = cursor.execute("SELECT COUNT(*) FROM pv_modules").fetchone()[0]
+            cursor.executemany(upsert_query, df.to_numpy(dtype=object).tolist())
+            upserted = cursor.rowcount
+            inserted = cursor.execute("SELECT COUNT(*) FROM pv_modules").fetchone()[0] - rows_before
+
+            if inserted:
+                print(f"Inserted {inserted} new modules.")
+            else:
+                print("No new modules to insert.")
+            print(f"Updated {upserted - inserted} existing modules.")
+        except sqlite3.Error as e:
+            # Re-raise so the load is rolled back and the download isn't recorded as stored
             print(f"Error inserting data: {e}")
-    else:
-        # Table exists with module_id column, we need to handle upserts
-        # First, get existing module_ids
-        cursor.execute("SELECT module_id FROM pv_modules")
-        existing_ids = [row[0] for row in cursor.fetchall()]
-        
-        # Split dataframe into new and existing records
-        df_new = df[~df['module_id'].isin(existing_ids)]
-        df_update = df[df['module_id'].isin(existing_ids)]
-        
-        # Insert new records
-        if not df_new.empty:
-            # Insert one by one to handle any potential integrity errors
-            inserted = 0
-            for _, row in df_new.iterrows():
-                try:
-                    pd.DataFrame([row]).to_sql('pv_modules', conn, if_exists='append', index=False)
-                    inserted += 1
-                except sqlite3.IntegrityError:
-                    # Skip duplicates
-                    pass
-            print(f"Inserted {inserted} new modules.")
-        else:
-            print("No new modules to insert.")
-        
-        # Update existing records
-        update_count = 0
-        for _, row in df_update.iterrows():
-            module_id = row['module_id']
-            
-            # Build update query dynamically
-            update_parts = []
-            params = []
-            
-            for col in df.columns:
-                if col != 'module_id':
-                    update_parts.append(f'"{col}" = ?')
-                    # Handle NaT values and Timestamp objects
-                    value = row[col]
-                    if pd.isna(value) or str(value) == 'NaT':
-                        params.append(None)
-                    elif isinstance(value, pd.Timestamp):
-                        # Convert Timestamp to string format
-                        params.append(value.strftime('%Y-%m-%d %H:%M:%S'))
-                    else:
-                        params.append(value)
-            
-            update_query = f'UPDATE pv_modules SET {", ".join(update_parts)} WHERE module_id = ?'
-            params.append(module_id)
-            
-            cursor.execute(update_query, params)
-            update_count += cursor.rowcount
-        
-        print(f"Updated {update_count} existing modules.")
-
-    # Connection will be automatically committed and closed by the context manager
-
-print("Data has been successfully downloaded and stored in the database.")
-print(f"Total rows: {len(df)}")
-print(f"Total columns: {len(df.columns)}")
-print("\nFirst 5 column names:")
-for i, col in enumerate(df.columns[:5]):
-    print(f"{i+1}. {col}")
+            raise
+
+        # Connection will be automatically committed and closed by the context manager
+
+    # Index the columns the explorer filters and sorts by
+    indexed_columns = {'manufacturer': 'Manufacturer', 'technology': 'Technology', 'listing_date': 'CEC Listing Date'}
+    create_indexes(db_path, 'pv_modules',
+                   {role: col for role, col in indexed_columns.items() if col in df.columns})
+
+    # Step 7: Save a columnar snapshot of the table so the explorer can read it without SQLite
+    write_parquet_snapshot(db_path, 'pv_modules', os.path.join(data_dir, 'pv_modules.parquet'))
+
+    # Remember this download so an unchanged list can be skipped next time
+    save_download_validators(cache_path, validators)
+
+    print("Data has been successfully downloaded and stored in the database.")
+    print(f"Total rows: {len(df)}")
+    print(f"Total columns: {len(df.columns)}")
+    if VERBOSE:
+        print("\nFirst 5 column names:")
+        for i, col in enumerate(df.columns[:5]):
+            print(f"{i+1}. {col}")
+
+if __name__ == "__main__":
+    main()
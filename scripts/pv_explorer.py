@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
 import sqlite3
+import os
 import plotly.express as px
 from datetime import datetime
 
@@ -49,43 +50,106 @@ if st.button("Refresh Data"):
     st.cache_data.clear()
     st.rerun()
 
-# Function to load data
-@st.cache_data(ttl=10, show_spinner="Loading database...")
-def load_data():
-    conn = sqlite3.connect('pv_modules.db')
-    query = "SELECT * FROM pv_modules"
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    
-    # Handle date columns - now they're already stored as strings in the database
+# Shared read-only database connection, kept open across reruns
+@st.cache_resource
+def get_conn():
+    conn = sqlite3.connect('pv_modules.db', check_same_thread=False)
+    conn.execute('PRAGMA query_only=ON')
+    return conn
+
+# Function to trim the date columns - now they're already stored as strings in the database
+def prepare_dates(df):
     date_columns = ['CEC Listing Date', 'Last Update', 'Date Added to Tool']
     for col in date_columns:
         if col in df.columns:
-            df[col] = df[col].apply(
-                lambda x: x[:10] if pd.notna(x) and isinstance(x, str) and len(x) > 10 else x
-            )
-    
+            df[col] = df[col].astype('string').str.slice(0, 10)
     return df
 
-# Load the data
+# Power is stored as text; read it straight into a float column
+POWER_DTYPES = {'Nameplate Pmax ((W))': 'float64'}
+
+# SQLite casts blanks (stored as 'nan') and other text to 0.0, so the SQL paths only cast
+# values made of number characters with at least one digit
+POWER_SQL = 'CAST("Nameplate Pmax ((W))" AS REAL)'
+HAS_POWER_SQL = (
+    '"Nameplate Pmax ((W))" GLOB \'*[0-9]*\' AND "Nameplate Pmax ((W))" NOT GLOB \'*[^0-9.eE+-]*\''
+)
+
+# Read from the Parquet snapshot written by the downloader; None if there is no snapshot
+def read_snapshot(columns=None, filters=None):
+    try:
+        df = pd.read_parquet('pv_modules.parquet', columns=columns, filters=filters)
+    except (FileNotFoundError, ImportError):
+        return None
+    return df.astype({col: dtype for col, dtype in POWER_DTYPES.items() if col in df.columns})
+
+# Function to load the sidebar options; they only change when the database file is rewritten,
+# so the file's modification time is part of the cache key
+@st.cache_data(ttl=60, show_spinner="Loading database...")
+def filter_options(db_mtime):
+    conn = get_conn()
+    manufacturers = [row[0] for row in conn.execute(
+        'SELECT DISTINCT Manufacturer FROM pv_modules WHERE Manufacturer IS NOT NULL ORDER BY 1'
+    )]
+    technologies = [row[0] for row in conn.execute(
+        'SELECT DISTINCT Technology FROM pv_modules WHERE Technology IS NOT NULL ORDER BY 1'
+    )]
+    total = conn.execute('SELECT COUNT(*) FROM pv_modules').fetchone()[0]
+    return manufacturers, technologies, total
+
+# Function to get the power slider endpoints, aggregated by SQLite
+@st.cache_data(ttl=10)
+def get_power_bounds():
+    cur = get_conn().execute(
+        f'SELECT MIN({POWER_SQL}), MAX({POWER_SQL}) FROM pv_modules WHERE {HAS_POWER_SQL}'
+    )
+    return cur.fetchone()
+
+# Function to load only the modules matching the sidebar filters
+@st.cache_data(ttl=10)
+def load_filtered_data(manufacturer, technology, power_range):
+    filters = []
+    if manufacturer != 'All':
+        filters.append(('Manufacturer', '==', manufacturer))
+    if technology != 'All':
+        filters.append(('Technology', '==', technology))
+    df = read_snapshot(filters=filters or None)
+    if df is not None:
+        power = df['Nameplate Pmax ((W))']
+        df = df[(power >= power_range[0]) & (power <= power_range[1])].reset_index(drop=True)
+        return prepare_dates(df)
+    
+    # No snapshot yet: filter in SQLite instead
+    conditions = [HAS_POWER_SQL, f'{POWER_SQL} BETWEEN ? AND ?']
+    params = list(power_range)
+    if manufacturer != 'All':
+        conditions.append('Manufacturer = ?')
+        params.append(manufacturer)
+    if technology != 'All':
+        conditions.append('Technology = ?')
+        params.append(technology)
+    
+    query = "SELECT * FROM pv_modules WHERE " + " AND ".join(conditions)
+    df = pd.read_sql_query(query, get_conn(), params=params, dtype=POWER_DTYPES)
+    return prepare_dates(df)
+
+# Load the filter options
 with st.spinner("Loading data..."):
-    df = load_data()
+    manufacturer_options, technology_options, total_modules = filter_options(os.path.getmtime('pv_modules.db'))
 
 # Sidebar for filters
 st.sidebar.markdown("## Filters")
 
 # Manufacturer filter
-manufacturers = ['All'] + sorted(df['Manufacturer'].unique().tolist())
+manufacturers = ['All'] + manufacturer_options
 selected_manufacturer = st.sidebar.selectbox("Manufacturer", manufacturers)
 
 # Technology filter
-technologies = ['All'] + sorted(df['Technology'].unique().tolist())
+technologies = ['All'] + technology_options
 selected_technology = st.sidebar.selectbox("Technology", technologies)
 
-# Power range filter - convert to numeric first
-df['Nameplate Pmax ((W))'] = pd.to_numeric(df['Nameplate Pmax ((W))'], errors='coerce')
-min_power = float(df['Nameplate Pmax ((W))'].min())
-max_power = float(df['Nameplate Pmax ((W))'].max())
+# Power range filter
+min_power, max_power = get_power_bounds()
 power_range = st.sidebar.slider(
     "Power Range (W)", 
     min_value=min_power,
@@ -93,31 +157,18 @@ power_range = st.sidebar.slider(
     value=(min_power, max_power)
 )
 
-# Apply filters
-filtered_df = df.copy()
-if selected_manufacturer != 'All':
-    filtered_df = filtered_df[filtered_df['Manufacturer'] == selected_manufacturer]
-if selected_technology != 'All':
-    filtered_df = filtered_df[filtered_df['Technology'] == selected_technology]
-
-# Convert power column to numeric to ensure proper filtering
-filtered_df['Nameplate Pmax ((W))'] = pd.to_numeric(filtered_df['Nameplate Pmax ((W))'], errors='coerce')
-
-# Apply power range filter
-filtered_df = filtered_df[
-    (filtered_df['Nameplate Pmax ((W))'] >= power_range[0]) & 
-    (filtered_df['Nameplate Pmax ((W))'] <= power_range[1])
-]
+# Apply filters in SQL so only the matching rows are read into pandas
+filtered_df = load_filtered_data(selected_manufacturer, selected_technology, power_range)
 
 # Main content area
-st.markdown(f"### Showing {len(filtered_df)} of {len(df)} modules")
+st.markdown(f"### Showing {len(filtered_df)} of {total_modules} modules")
 
 # Tabs for different views
 tab1, tab2, tab3 = st.tabs(["Data Table", "Visualizations", "Module Comparison"])
 
 with tab1:
     # Column selection
-    all_columns = df.columns.tolist()
+    all_columns = filtered_df.columns.tolist()
     default_columns = ['Manufacturer', 'Model Number', 'Technology', 'Nameplate Pmax ((W))', 'PTC', 'module_id', 'Date Added to Tool']
     
     with st.expander("Select Columns to Display"):
@@ -174,7 +225,8 @@ with tab2:
                 hover_data=["Manufacturer", "Model Number"],
                 title="Power vs Efficiency",
                 labels={"Nameplate Pmax ((W))": "Power (W)", "P2/Pref": "Efficiency Ratio"},
-                template="simple_white"
+                template="simple_white",
+                render_mode="webgl"
             )
             st.plotly_chart(fig, use_container_width=True)
         else:
@@ -0,0 +1,35 @@
+import sys
+import time
+import concurrent.futures
+from pathlib import Path
+
+# The downloaders are standalone scripts that import their shared helpers as siblings
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "modules"))
+
+import battery_downloader
+import inverter_downloader
+import pv_module_downloader
+
+def refresh_all():
+    """Run the battery, inverter and PV module downloaders concurrently in this process.
+
+    Each one writes its database into the current working directory, like the scripts do
+    when run on their own. The HTTP fetches and the workbook parses overlap, so a refresh
+    takes about as long as the slowest download instead of the sum of all three.
+    """
+    start_time = time.time()
+    jobs = {
+        'battery': battery_downloader.main,
+        'inverter': inverter_downloader.main,
+        'pv_module': pv_module_downloader.main,
+    }
+    with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
+        futures = {executor.submit(job): name for name, job in jobs.items()}
+        for future in concurrent.futures.as_completed(futures):
+            # Re-raise the first failure instead of silently dropping it
+            future.result()
+            print(f"Finished {futures[future]} downloader")
+    print(f"Refresh complete in {time.time() - start_time:.2f} seconds!")
+
+if __name__ == "__main__":
+    refresh_all()
@@ -14,20 +14,19 @@ MAX_RETRIES = 2
 # Check if we're running on Railway
 IS_RAILWAY = 'RAILWAY_ENVIRONMENT' in os.environ
 
+# Database written by each downloader script
+SCRIPT_TO_DB = {
+    'pv_module_downloader.py': 'pv_modules.db',
+    'inverter_downloader.py': 'inverters.db',
+    'battery_downloader.py': 'batteries.db',
+    'energy_storage_downloader.py': 'energy_storage.db',
+    'meter_downloader.py': 'meters.db',
+}
+
 def run_downloader(downloader_path, python_executable):
     """Run a single downloader script with timeout and retries."""
     downloader_str = str(downloader_path)
-    db_name = os.path.basename(downloader_str).replace('_downloader.py', '.db')
-    if 'inverter' in downloader_str:
-        db_name = 'inverters.db'
-    elif 'energy_storage' in downloader_str:
-        db_name = 'energy_storage.db'
-    elif 'battery' in downloader_str:
-        db_name = 'batteries.db'
-    elif 'meter' in downloader_str:
-        db_name = 'meters.db'
-    elif 'pv_module' in downloader_str:
-        db_name = 'pv_modules.db'
+    db_name = SCRIPT_TO_DB[Path(downloader_path).name]
     
     # Check if database already exists
     base_dir = Path(os.path.dirname(os.path.abspath(__file__)))
@@ -44,6 +43,7 @@ def run_downloader(downloader_path, python_executable):
             # Run with timeout
             process = subprocess.run(
                 [python_executable, downloader_str],
+                env={**os.environ, 'PYTHONUNBUFFERED': '1'},
                 check=True,
                 timeout=DOWNLOADER_TIMEOUT,
                 capture_output=True,
@@ -112,7 +112,9 @@ def run_downloaders():
     # Run downloaders in parallel if not on Railway
     if not IS_RAILWAY:
         print("Running downloaders in parallel...")
-        with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
+        # Each downloader is its own process writing its own database, so all of them can
+        # download and parse at the same time; the threads only wait on the subprocesses
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(downloaders)) as executor:
             futures = {executor.submit(run_downloader, d, python_executable): d for d in downloaders}
             for future in concurrent.futures.as_completed(futures):
                 downloader = futures[future]
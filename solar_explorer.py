@@ -1,12 +1,22 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
+import pyarrow as pa
 import sqlite3
 import plotly.express as px
-import subprocess
+import plotly.graph_objects as go
 import os
 import sys
+import importlib
+import traceback
 from datetime import datetime
 from pathlib import Path
+from streamlit.errors import StreamlitAPIException
+
+try:
+    import connectorx as cx
+except ImportError:
+    cx = None
 
 # Set page configuration
 st.set_page_config(
@@ -16,293 +26,591 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS for a minimalist aesthetic
-st.markdown("""
-<style>
-    .main {
-        background-color: #f8f9fa;
-    }
-    .stButton button {
-        background-color: #343a40;
-        color: white;
-    }
-    .stDataFrame {
-        padding: 10px;
-    }
-    h1, h2, h3 {
-        color: #343a40;
-    }
-    .stSidebar {
-        background-color: #f8f9fa;
-    }
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 0px;
-        justify-content: flex-start;
-    }
-    .stTabs [data-baseweb="tab"] {
-        height: 60px;
-        white-space: pre-wrap;
-        background-color: white;
-        border-radius: 4px 4px 0 0;
-        padding: 15px 30px;
-        min-width: 250px;
-        font-size: 20px;
-        font-weight: 400;
-        color: #666;
-        border: 1px solid #eee;
-        border-bottom: none;
-    }
-    .stTabs [aria-selected="true"] {
-        background-color: #f0f2f6;
-        border-bottom: 3px solid #4e8df5;
-        font-weight: 700;
-        color: #333;
-    }
-    .stat-container {
-        display: flex;
-        justify-content: space-between;
-        margin-bottom: 20px;
-    }
-    .stat-box {
-        background-color: white;
-        border-radius: 5px;
-        padding: 15px 20px;
-        box-shadow: 0 1px 3px rgba(0,0,0,0.1);
-        width: 30%;
-        text-align: center;
-    }
-    .stat-label {
-        font-size: 14px;
-        color: #666;
-        margin-bottom: 5px;
-    }
-    .stat-value {
-        font-size: 24px;
-        font-weight: bold;
-        color: #333;
-    }
-</style>
-""", unsafe_allow_html=True)
-
-# Add custom CSS to make the search bar narrower and style the refresh button
-st.markdown("""
-<style>
-    /* Make the search input narrower */
-    [data-testid="stTextInput"] {
-        max-width: 250px;
-    }
-    
-    /* Style the refresh button to look like the screenshot */
-    [data-testid="stButton"] button {
-        background-color: #f8f9fa;
-        color: #6c757d;
-        border: 1px solid #e0e0e0;
-        border-radius: 50%;
-        width: 28px;
-        height: 28px;
-        padding: 0;
-        font-size: 14px;
-        line-height: 1;
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        min-height: 0;
-        box-shadow: none;
-    }
-    
-    /* Hover effect for refresh button */
-    [data-testid="stButton"] button:hover {
-        background-color: #f0f0f0;
-        border-color: #d0d0d0;
-        color: #495057;
-    }
-</style>
-""", unsafe_allow_html=True)
+# Define base directory for database files
+BASE_DIR = Path(os.path.dirname(os.path.abspath(__file__)))
+
+# Function to read the app's custom CSS (a minimalist aesthetic, plus a narrower search bar
+# and round refresh button) once per process; it is injected as a single <style> block
+@st.cache_resource
+def load_css():
+    return (BASE_DIR / '.streamlit' / 'style.css').read_text()
+
+st.markdown(f"<style>{load_css()}</style>", unsafe_allow_html=True)
 
 # Title
 st.title("☀️ Solar Equipment Explorer")
 
-# Define base directory for database files
-BASE_DIR = Path(os.path.dirname(os.path.abspath(__file__)))
+# Above this many rows, scatter plots are drawn as density heatmaps
+MAX_SCATTER_POINTS = 5000
+
+# Chart palette, and the gray used for the "Other" bar of the manufacturer distribution
+CHART_COLORS = px.colors.qualitative.Bold
+OTHER_COLOR = '#CCCCCC'
+
+# Cached tables expire after an hour so results nobody is using don't stay in memory
+DATA_CACHE_TTL = 3600
+
+# Each table loader keeps its current and previous data version; caches keyed by table,
+# filter or column selection keep a bounded number of recent results instead of growing forever
+DATA_CACHE_MAX_ENTRIES = 2
+LOOKUP_CACHE_MAX_ENTRIES = 32
+
+# Database file and table behind each equipment tab
+EQUIPMENT_TABLES = {
+    "PV Modules": ('pv_modules.db', 'pv_modules'),
+    "Grid Support Inverter List": ('inverters.db', 'inverters'),
+    "Energy Storage Systems": ('energy_storage.db', 'energy_storage'),
+    "Batteries": ('batteries.db', 'batteries'),
+    "Meters": ('meters.db', 'meters'),
+}
+
+# Downloader module behind each equipment tab, in the modules directory; each one exposes main()
+DOWNLOADER_MODULES = {
+    "PV Modules": 'pv_module_downloader',
+    "Grid Support Inverter List": 'inverter_downloader',
+    "Energy Storage Systems": 'energy_storage_downloader',
+    "Batteries": 'battery_downloader',
+    "Meters": 'meter_downloader',
+}
+
+# Listing date column behind each tab's "Latest Listing Date" stat
+LISTING_DATE_COLUMNS = {
+    "PV Modules": 'CEC Listing Date',
+    "Grid Support Inverter List": 'Grid Support Listing Date',
+    "Energy Storage Systems": 'Energy Storage Listing Date',
+    "Batteries": 'Battery Listing Date',
+    "Meters": 'Meter Listing Date',
+}
+
+# Manufacturer column of each tab's table; the downloaders index it (with the listing date
+# column), so manufacturer filters and the latest listing date seek instead of scanning
+MANUFACTURER_COLUMNS = {
+    "PV Modules": 'Manufacturer',
+    "Grid Support Inverter List": 'Manufacturer Name',
+    "Energy Storage Systems": 'Manufacturer',
+    "Batteries": 'Manufacturer',
+    "Meters": 'Manufacturer',
+}
+
+# Filter and chart columns that hold plain numbers, parsed to float once at load time.
+# Columns mixing numbers with notes (e.g. battery Round Trip Efficiency) are left as text.
+NUMERIC_COLUMNS = {
+    "PV Modules": ('Nameplate Pmax (W)', 'PTC Efficiency (%)', 'Power Rating (W)'),
+    "Grid Support Inverter List": ('Weighted Efficiency ((%))', 'CEC Weighted Efficiency (%)'),
+    "Energy Storage Systems": ('Capacity (kWh)', 'Continuous Power Rating (kW)'),
+    "Batteries": ('Capacity (kWh)', 'Discharge Rate (kW)'),
+    "Meters": (),
+}
+
+# Low-cardinality text columns stored as categories: smaller, and faster to compare, count and group
+CATEGORICAL_COLUMNS = {
+    "PV Modules": ('Manufacturer', 'Technology'),
+    "Grid Support Inverter List": ('Manufacturer Name',),
+    "Energy Storage Systems": ('Manufacturer', 'Chemistry', 'Certifying Entity'),
+    "Batteries": ('Manufacturer', 'Chemistry', 'Certifying Entity'),
+    "Meters": ('Manufacturer', 'Display Type'),
+}
+
+# Columns each tab loads up front: the default display columns plus its id, search, filter,
+# chart and date columns. Numeric columns are loaded as well for the correlation plots;
+# any other column is read on demand when it is picked for display or comparison.
+REQUIRED_COLUMNS = {
+    "PV Modules": (
+        'module_id', 'Manufacturer', 'Model Number', 'CEC Listing Date', 'Technology', 'Nameplate Pmax (W)',
+        'PTC Efficiency (%)', 'Power Rating (W)', 'Last Update', 'Date Added to Tool'
+    ),
+    "Grid Support Inverter List": (
+        'inverter_id', 'Manufacturer Name', 'Model Number1', 'Grid Support Listing Date', 'Description',
+        'CEC Weighted Efficiency (%)', 'Weighted Efficiency ((%))', 'Weighted Efficiency (%)', 'Rated Output Power (kW)',
+        'Maximum Continuous Output Power at Unity Power Factor ((kW))', 'Last Update', 'Date Added to Tool'
+    ),
+    "Energy Storage Systems": (
+        'storage_id', 'Manufacturer', 'Model Number', 'Energy Storage Listing Date', 'Chemistry', 'Description',
+        'PV DC Input Capability', 'Capacity (kWh)', 'Continuous Power Rating (kW)', 'Maximum Discharge Rate (kW)',
+        'Voltage (Vac)', 'Certifying Entity', 'Certificate Date', 'Round Trip Efficiency (%)', 'Last Update',
+        'Date Added to Tool'
+    ),
+    "Batteries": (
+        'battery_id', 'Manufacturer', 'Model Number', 'Battery Listing Date', 'Chemistry', 'Description',
+        'Capacity (kWh)', 'Discharge Rate (kW)', 'Round Trip Efficiency (%)', 'Certifying Entity', 'Certificate Date',
+        'Last Update', 'Date Added to Tool'
+    ),
+    "Meters": (
+        'meter_id', 'Manufacturer', 'Model Number', 'Meter Listing Date', 'Display Type', 'PBI Meter', 'Note',
+        'Last Update', 'Date Added to Tool'
+    ),
+}
 
 # Function to get database path
 def get_db_path(db_name):
     return str(BASE_DIR / 'db' / db_name)
 
+# Shared read-only connection per database, kept open across reruns so SQLite's page cache stays warm
+@st.cache_resource
+def get_conn(db_name):
+    # The app only reads; mmap lets SQLite serve pages straight from the OS page cache
+    conn = sqlite3.connect(f"{Path(get_db_path(db_name)).as_uri()}?mode=ro", uri=True, check_same_thread=False)
+    conn.execute("PRAGMA mmap_size=268435456")
+    conn.execute("PRAGMA cache_size=-65536")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA query_only=1")
+    return conn
+
+# Function to get a file's modification time, or 0 when it doesn't exist
+def file_mtime(path):
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+# Function to get the data version for an equipment type: the modification times of its database,
+# the database's WAL file and its Parquet snapshot. Passing it to a loader keys its cache, so every
+# session reloads a table once a download rewrites it, and only that table's caches miss
+def get_data_version(equipment_type):
+    db_path = Path(get_db_path(EQUIPMENT_TABLES[equipment_type][0]))
+    return tuple(file_mtime(path) for path in (
+        db_path, db_path.with_name(db_path.name + '-wal'), db_path.with_suffix('.parquet')
+    ))
+
+# Each tab reruns on its own when one of its widgets changes, so filtering one equipment type
+# doesn't reload and redraw the other four. Streamlit versions without st.fragment (which also
+# lack nested fragments) run these as plain functions and rerun the whole page as before.
+tab_fragment = getattr(st, 'fragment', None) or (lambda func: func)
+
+# Function to rerun only the current tab after its data changed, or the whole app when
+# this isn't a fragment run (or Streamlit predates fragment-scoped reruns)
+def rerun_tab():
+    try:
+        st.rerun(scope='fragment')
+    except (TypeError, StreamlitAPIException):
+        st.rerun()
+
+# Function to run a read query against a database, through connectorx when it is installed.
+# Both paths return Arrow-backed columns, like the Parquet snapshots: text as Arrow strings
+# and REAL columns as double[pyarrow] instead of object
+def read_query(db_name, query):
+    if cx is not None:
+        # connectorx builds the columns directly instead of going through Python row tuples
+        try:
+            table = cx.read_sql(f"sqlite://{get_db_path(db_name)}", query, return_type="arrow")
+            return table.to_pandas(types_mapper=pd.ArrowDtype)
+        except Exception as e:
+            print(f"connectorx read failed, falling back to sqlite3: {e}")
+    return pd.read_sql_query(query, get_conn(db_name), dtype_backend='pyarrow')
+
+# Function to read the Parquet snapshot a downloader writes next to its database, if there is one.
+# A missing or unreadable snapshot returns None so the caller reads the database instead
+def read_parquet_snapshot(db_name, columns=None):
+    try:
+        return pd.read_parquet(Path(get_db_path(db_name)).with_suffix('.parquet'), columns=columns, dtype_backend='pyarrow')
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+# Function to list a table's columns with their declared SQLite types
+@st.cache_data(ttl=DATA_CACHE_TTL, max_entries=LOOKUP_CACHE_MAX_ENTRIES, show_spinner=False)
+def get_table_columns(db_name, table, version=0):
+    return [(row[1], row[2]) for row in get_conn(db_name).execute(f"PRAGMA table_info({table})")]
+
+# Function to pick the columns an equipment tab loads up front
+def get_load_columns(equipment_type, version=0):
+    db_name, table = EQUIPMENT_TABLES[equipment_type]
+    required = REQUIRED_COLUMNS[equipment_type]
+    return [name for name, col_type in get_table_columns(db_name, table, version)
+            if name in required or col_type in ('REAL', 'INTEGER')]
+
+# Function to build a SELECT for the given columns; a missing table has none, and SELECT * reports it
+def select_columns_query(table, columns):
+    if not columns:
+        return f"SELECT * FROM {table}"
+    columns_sql = ', '.join(f'"{col}"' for col in columns)
+    return f"SELECT {columns_sql} FROM {table}"
+
+# Function to load columns that were left out of an equipment tab's initial load, keyed by its id column
+@st.cache_data(ttl=DATA_CACHE_TTL, max_entries=LOOKUP_CACHE_MAX_ENTRIES, show_spinner=False)
+def load_extra_columns(equipment_type, id_column, columns, version=0):
+    db_name, table = EQUIPMENT_TABLES[equipment_type]
+    return use_arrow_strings(read_query(db_name, select_columns_query(table, [id_column, *columns])))
+
+# Function to fill in any of the given columns that df doesn't have yet, matching rows by id
+def with_columns(df, equipment_type, id_column, columns):
+    missing = tuple(col for col in columns if col not in df.columns)
+    if not missing:
+        return df[list(columns)]
+    extra = load_extra_columns(equipment_type, id_column, missing, get_data_version(equipment_type))
+    merged = df.merge(extra, on=id_column, how='left')
+    merged.index = df.index
+    return merged[list(columns)]
+
+# Function to get the lowercased manufacturer and model strings the search matches against.
+# They are built once per data version and kept in the session, so typing a query only runs substring checks
+def get_search_keys(df, equipment_type, manufacturer_column, model_column):
+    fingerprint = (get_data_version(equipment_type), len(df))
+    cached = st.session_state.get(f"search_keys_{equipment_type}")
+    if cached is None or cached[0] != fingerprint:
+        cached = (
+            fingerprint,
+            [str(value).lower() for value in df[manufacturer_column].tolist()],
+            [str(value).lower() for value in df[model_column].tolist()],
+        )
+        st.session_state[f"search_keys_{equipment_type}"] = cached
+    return cached[1], cached[2]
+
+# Function to parse values to numbers, leaving anything that isn't a number missing. On Arrow-backed text,
+# pd.to_numeric(errors='coerce') turns such values into NaN rather than null, which isna() doesn't count
+def parse_numeric(values):
+    numbers = pd.to_numeric(values, errors='coerce')
+    if isinstance(numbers.dtype, pd.ArrowDtype):
+        numbers = numbers.mask(np.isnan(numbers.to_numpy(dtype='float64', na_value=np.nan)))
+    return numbers
+
+# Function to parse an equipment tab's numeric columns to float, so filters and charts don't re-parse them
+def parse_numeric_columns(df, equipment_type):
+    for col in NUMERIC_COLUMNS[equipment_type]:
+        if col in df.columns:
+            df[col] = parse_numeric(df[col])
+    return df
+
+# Function to store an equipment tab's low-cardinality text columns as categories
+def encode_categorical_columns(df, equipment_type):
+    for col in CATEGORICAL_COLUMNS[equipment_type]:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
+
+# Function to store the remaining text columns as Arrow-backed strings, which st.dataframe
+# serializes to Arrow in one copy instead of converting each Python string object
+def use_arrow_strings(df):
+    for col in df.columns:
+        if df[col].dtype == object or isinstance(df[col].dtype, pd.StringDtype):
+            df[col] = df[col].astype('string[pyarrow]')
+    return df
+
+# Function to turn manufacturer counts into the top-N share table behind the distribution chart.
+# Cached on the small counts Series, so switching charts or rerunning doesn't rebuild it
+@st.cache_data(ttl=DATA_CACHE_TTL, max_entries=LOOKUP_CACHE_MAX_ENTRIES, show_spinner=False)
+def manufacturer_share(counts, top_n=10):
+    # Categorical columns also report manufacturers that were filtered out
+    manufacturer_counts = counts[counts > 0].reset_index()
+    manufacturer_counts.columns = ['Manufacturer', 'Count']
+    # Plain strings, so plotly doesn't group by the full category list
+    manufacturer_counts['Manufacturer'] = manufacturer_counts['Manufacturer'].astype(str)
+    
+    # Calculate percentage
+    total = manufacturer_counts['Count'].sum()
+    manufacturer_counts['Percentage'] = (manufacturer_counts['Count'] / total * 100).round(1)
+    
+    # Keep only the top_n manufacturers, group others
+    if len(manufacturer_counts) > top_n:
+        top_manufacturers = manufacturer_counts.head(top_n).copy()
+        other_count = manufacturer_counts.iloc[top_n:]['Count'].sum()
+        other_percentage = manufacturer_counts.iloc[top_n:]['Percentage'].sum()
+        
+        # Add "Other" category
+        other_row = pd.DataFrame({
+            'Manufacturer': ['Other'],
+            'Count': [other_count],
+            'Percentage': [other_percentage.round(1)]
+        })
+        
+        manufacturer_counts = pd.concat([top_manufacturers, other_row])
+    
+    # Sort by percentage descending
+    manufacturer_counts = manufacturer_counts.sort_values('Percentage', ascending=True)
+    
+    return manufacturer_counts
+
+# Function to draw the manufacturer distribution chart from the filtered rows' manufacturer counts.
+# Cached like the share table, so switching back to this chart doesn't build the figure again
+@st.cache_data(ttl=DATA_CACHE_TTL, max_entries=LOOKUP_CACHE_MAX_ENTRIES, show_spinner=False)
+def manufacturer_share_figure(counts, equipment_type, top_n=10):
+    manufacturer_counts = manufacturer_share(counts, top_n)
+    
+    # Distinct colors for top categories, gray for "Other"
+    colors = CHART_COLORS[:top_n]
+    if len(manufacturer_counts) > top_n:
+        colors = colors + [OTHER_COLOR]
+    
+    # Create horizontal bar chart
+    fig = px.bar(
+        manufacturer_counts,
+        y='Manufacturer',
+        x='Percentage',
+        title=f'Share of {equipment_type} by Manufacturer (%)',
+        color='Manufacturer',
+        color_discrete_sequence=colors,
+        text='Percentage',
+        orientation='h',
+        height=500
+    )
+    
+    # Improve layout
+    fig.update_traces(texttemplate='%{text}%', textposition='outside')
+    fig.update_layout(
+        xaxis_title='Market Share (%)',
+        yaxis_title='Manufacturer',
+        showlegend=False,
+        margin=dict(l=20, r=20, t=40, b=20),
+        xaxis=dict(range=[0, max(manufacturer_counts['Percentage']) * 1.15])  # Add space for labels
+    )
+    return fig
+
+# Function to draw per-manufacturer box plots from precomputed quartiles instead of raw points
+def box_summary_figure(df, group_column, value_column, title):
+    values = parse_numeric(df[value_column])
+    groups = df[group_column]
+    quartiles = values.groupby(groups, observed=True).quantile([0.25, 0.5, 0.75]).unstack()
+    quartiles.columns = ['q1', 'median', 'q3']
+    
+    # Whiskers stop at the furthest points within 1.5 IQR of the box, as in px.box
+    iqr = quartiles['q3'] - quartiles['q1']
+    low = groups.map(quartiles['q1'] - 1.5 * iqr).astype(float)
+    high = groups.map(quartiles['q3'] + 1.5 * iqr).astype(float)
+    in_fence = values.between(low, high)
+    quartiles['lowerfence'] = values[in_fence].groupby(groups[in_fence], observed=True).min()
+    quartiles['upperfence'] = values[in_fence].groupby(groups[in_fence], observed=True).max()
+    quartiles = quartiles.dropna().sort_values('median', ascending=False)
+    
+    fig = go.Figure()
+    colors = CHART_COLORS
+    for i, (name, row) in enumerate(quartiles.iterrows()):
+        fig.add_trace(go.Box(
+            x=[name],
+            q1=[row['q1']],
+            median=[row['median']],
+            q3=[row['q3']],
+            lowerfence=[row['lowerfence']],
+            upperfence=[row['upperfence']],
+            name=str(name),
+            marker_color=colors[i % len(colors)]
+        ))
+    fig.update_layout(title=title, height=500)
+    return fig
+
 
 # Function to load PV module data
-@st.cache_data
-def load_pv_data():
-    with sqlite3.connect(get_db_path('pv_modules.db')) as conn:
-        query = "SELECT * FROM pv_modules"
-        df = pd.read_sql_query(query, conn)
+@st.cache_data(ttl=DATA_CACHE_TTL, max_entries=DATA_CACHE_MAX_ENTRIES, show_spinner=False)
+def load_pv_data(version=0):
+    query = select_columns_query('pv_modules', get_load_columns("PV Modules", version))
+    df = read_query('pv_modules.db', query)
     
     # Handle date columns - they're already stored as strings in the database
     date_columns = ['CEC Listing Date', 'Last Update', 'Date Added to Tool']
     for col in date_columns:
         if col in df.columns:
-            # Vectorized operation instead of apply
-            mask = df[col].notna() & df[col].astype(str).str.len().gt(10)
-            df.loc[mask, col] = df.loc[mask, col].astype(str).str[:10]
+            # Single vectorized slice; shorter strings and NA pass through unchanged
+            df[col] = df[col].astype('string').str.slice(0, 10)
     
-    return df
+    parse_numeric_columns(df, "PV Modules")
+    return use_arrow_strings(encode_categorical_columns(df, "PV Modules"))
 
-# Function to load inverter data
-@st.cache_data
-def load_inverter_data():
-    with sqlite3.connect(get_db_path('inverters.db')) as conn:
-        query = "SELECT * FROM inverters"
-        df = pd.read_sql_query(query, conn)
-    
+# Apply the inverter column conversions shared by the full and filtered loaders
+def prepare_inverter_data(df):
     # Handle date columns - they're already stored as strings in the database
     date_columns = ['Date Added to Tool', 'Last Update', 'Grid Support Listing Date']
     for col in date_columns:
         if col in df.columns:
-            # Vectorized operation instead of apply
-            mask = df[col].notna() & df[col].astype(str).str.len().gt(10)
-            df.loc[mask, col] = df.loc[mask, col].astype(str).str[:10]
+            # Single vectorized slice; shorter strings and NA pass through unchanged
+            df[col] = df[col].astype('string').str.slice(0, 10)
     
-    return df
+    # Parse efficiency columns to float once here rather than on every filter
+    parse_numeric_columns(df, "Grid Support Inverter List")
+    
+    # Low-cardinality manufacturer names compare and group faster as categories
+    return use_arrow_strings(encode_categorical_columns(df, "Grid Support Inverter List"))
 
-# Function to load energy storage data
-@st.cache_data
-def load_energy_storage_data():
-    with sqlite3.connect(get_db_path('energy_storage.db')) as conn:
-        query = "SELECT * FROM energy_storage"
-        df = pd.read_sql_query(query, conn)
+# Function to load inverter data
+@st.cache_data(ttl=DATA_CACHE_TTL, max_entries=DATA_CACHE_MAX_ENTRIES, show_spinner=False)
+def load_inverter_data(version=0):
+    columns = get_load_columns("Grid Support Inverter List", version)
+    query = select_columns_query('inverters', columns)
+    # The columnar snapshot loads without building Python objects per cell
+    df = read_parquet_snapshot('inverters.db', columns or None)
+    if df is None:
+        df = read_query('inverters.db', query)
+    
+    return prepare_inverter_data(df)
+
+# Function to read only the rows of an equipment tab matching the selected filters, letting SQLite
+# pick out the manufacturer's rows through its index
+def read_filtered_rows(equipment_type, manufacturer, efficiency_column=None, efficiency_range=None, version=0):
+    db_name, table = EQUIPMENT_TABLES[equipment_type]
+    conditions = []
+    params = []
+    if manufacturer != "All":
+        conditions.append(f'"{MANUFACTURER_COLUMNS[equipment_type]}" = ?')
+        params.append(manufacturer)
+    if efficiency_column and efficiency_range:
+        conditions.append(f'CAST("{efficiency_column}" AS REAL) BETWEEN ? AND ?')
+        params.extend(efficiency_range)
+    
+    query = select_columns_query(table, get_load_columns(equipment_type, version))
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
     
+    return pd.read_sql_query(query, get_conn(db_name), params=params, dtype_backend='pyarrow')
+
+# Function to load only the inverters matching the selected filters
+@st.cache_data(ttl=DATA_CACHE_TTL, max_entries=LOOKUP_CACHE_MAX_ENTRIES, show_spinner=False)
+def load_filtered_inverter_data(manufacturer, efficiency_column=None, efficiency_range=None, version=0):
+    df = read_filtered_rows("Grid Support Inverter List", manufacturer, efficiency_column, efficiency_range, version)
+    return prepare_inverter_data(df)
+
+# Apply the energy storage column conversions shared by the full and filtered loaders
+def prepare_energy_storage_data(df):
     # Handle date columns - they're already stored as strings in the database
     date_columns = ['Date Added to Tool', 'Last Update', 'Energy Storage Listing Date', 'Certificate Date']
     for col in date_columns:
         if col in df.columns:
-            # Vectorized operation instead of apply
-            mask = df[col].notna() & df[col].astype(str).str.len().gt(10)
-            df.loc[mask, col] = df.loc[mask, col].astype(str).str[:10]
+            # Single vectorized slice; shorter strings and NA pass through unchanged
+            df[col] = df[col].astype('string').str.slice(0, 10)
     
-    return df
+    parse_numeric_columns(df, "Energy Storage Systems")
+    return use_arrow_strings(encode_categorical_columns(df, "Energy Storage Systems"))
+
+# Function to load energy storage data
+@st.cache_data(ttl=DATA_CACHE_TTL, max_entries=DATA_CACHE_MAX_ENTRIES, show_spinner=False)
+def load_energy_storage_data(version=0):
+    columns = get_load_columns("Energy Storage Systems", version)
+    # The columnar snapshot loads without building Python objects per cell
+    df = read_parquet_snapshot('energy_storage.db', columns or None)
+    if df is None:
+        query = select_columns_query('energy_storage', columns)
+        df = read_query('energy_storage.db', query)
+    return prepare_energy_storage_data(df)
+
+# Function to load only the energy storage systems matching the selected filters
+@st.cache_data(ttl=DATA_CACHE_TTL, max_entries=LOOKUP_CACHE_MAX_ENTRIES, show_spinner=False)
+def load_filtered_energy_storage_data(manufacturer, efficiency_column=None, efficiency_range=None, version=0):
+    df = read_filtered_rows("Energy Storage Systems", manufacturer, efficiency_column, efficiency_range, version)
+    return prepare_energy_storage_data(df)
 
 # Function to load battery data
-@st.cache_data
-def load_battery_data():
-    with sqlite3.connect(get_db_path('batteries.db')) as conn:
-        query = "SELECT * FROM batteries"
-        df = pd.read_sql_query(query, conn)
+@st.cache_data(ttl=DATA_CACHE_TTL, max_entries=DATA_CACHE_MAX_ENTRIES, show_spinner=False)
+def load_battery_data(version=0):
+    query = select_columns_query('batteries', get_load_columns("Batteries", version))
+    df = read_query('batteries.db', query)
     
     # Handle date columns - they're already stored as strings in the database
     date_columns = ['Date Added to Tool', 'Last Update', 'Battery Listing Date', 'Certificate Date']
     for col in date_columns:
         if col in df.columns:
-            # Vectorized operation instead of apply
-            mask = df[col].notna() & df[col].astype(str).str.len().gt(10)
-            df.loc[mask, col] = df.loc[mask, col].astype(str).str[:10]
+            # Single vectorized slice; shorter strings and NA pass through unchanged
+            df[col] = df[col].astype('string').str.slice(0, 10)
     
-    return df
+    parse_numeric_columns(df, "Batteries")
+    return use_arrow_strings(encode_categorical_columns(df, "Batteries"))
 
 # Function to load meter data
-@st.cache_data
-def load_meter_data():
-    with sqlite3.connect(get_db_path('meters.db')) as conn:
-        query = "SELECT * FROM meters"
-        df = pd.read_sql_query(query, conn)
+@st.cache_data(ttl=DATA_CACHE_TTL, max_entries=DATA_CACHE_MAX_ENTRIES, show_spinner=False)
+def load_meter_data(version=0):
+    columns = get_load_columns("Meters", version)
+    df = read_parquet_snapshot('meters.db', columns or None)
+    if df is None:
+        query = select_columns_query('meters', columns)
+        df = read_query('meters.db', query)
     
     # Handle date columns - they're already stored as strings in the database
     date_columns = ['Date Added to Tool', 'Last Update', 'Meter Listing Date']
     for col in date_columns:
         if col in df.columns:
-            # Vectorized operation instead of apply
-            mask = df[col].notna() & df[col].astype(str).str.len().gt(10)
-            df.loc[mask, col] = df.loc[mask, col].astype(str).str[:10]
+            # Single vectorized slice; shorter strings and NA pass through unchanged
+            df[col] = df[col].astype('string').str.slice(0, 10)
     
-    return df
+    parse_numeric_columns(df, "Meters")
+    return use_arrow_strings(encode_categorical_columns(df, "Meters"))
+
+# Loader behind each equipment tab
+EQUIPMENT_LOADERS = {
+    "PV Modules": load_pv_data,
+    "Grid Support Inverter List": load_inverter_data,
+    "Energy Storage Systems": load_energy_storage_data,
+    "Batteries": load_battery_data,
+    "Meters": load_meter_data,
+}
+
+# Function to find the latest listing date in an equipment table, as a display string
+@st.cache_data(ttl=DATA_CACHE_TTL, max_entries=LOOKUP_CACHE_MAX_ENTRIES, show_spinner=False)
+def load_latest_listing_date(equipment_type, version=0):
+    date_column = LISTING_DATE_COLUMNS.get(equipment_type)
+    if not date_column:
+        return "N/A"
+    
+    db_name, table = EQUIPMENT_TABLES[equipment_type]
+    try:
+        # One indexed MAX() skipping None, 'None' and empty values; substr keeps just the date part
+        latest_listing_date = get_conn(db_name).execute(
+            f"""SELECT substr(MAX("{date_column}"), 1, 10) FROM {table} WHERE "{date_column}" IS NOT NULL AND "{date_column}" NOT IN ('None', '')"""
+        ).fetchone()[0]
+    except sqlite3.Error as e:
+        print(f"Error processing dates: {e}")
+        return "N/A"
+    
+    return latest_listing_date or "N/A"
+
+# Function to precompute an equipment tab's stats and filter options once per cached load
+@st.cache_data(ttl=DATA_CACHE_TTL, max_entries=LOOKUP_CACHE_MAX_ENTRIES, show_spinner=False)
+def load_equipment_meta(equipment_type, manufacturer_column, efficiency_column, version=0):
+    df = EQUIPMENT_LOADERS[equipment_type](version)
+    
+    if isinstance(df[manufacturer_column].dtype, pd.CategoricalDtype):
+        # Categories are already unique and sorted
+        manufacturers = tuple(df[manufacturer_column].cat.categories)
+    else:
+        manufacturers = tuple(sorted(df[manufacturer_column].unique().tolist()))
+    
+    efficiency_ranges = {}
+    if efficiency_column in df.columns:
+        try:
+            efficiency_ranges[efficiency_column] = (float(df[efficiency_column].min()), float(df[efficiency_column].max()))
+        except (ValueError, TypeError):
+            # None marks a column that can't be filtered as a numeric range
+            efficiency_ranges[efficiency_column] = None
+    
+    return {
+        'manufacturers': manufacturers,
+        'manufacturer_count': df[manufacturer_column].nunique(),
+        'efficiency_ranges': efficiency_ranges,
+        'numeric_cols': tuple(df.select_dtypes(include=['float64', 'int64']).columns),
+    }
 
 # Create tabs for equipment types
 tab1, tab2, tab3, tab4, tab5 = st.tabs(["PV Modules", "Grid Support Inverter List", "Energy Storage Systems", "Batteries", "Meters"])
 
-# Function to run the appropriate downloader script based on equipment type
+# Function to run the appropriate downloader based on equipment type
 def run_downloader(equipment_type):
+    module_name = DOWNLOADER_MODULES.get(equipment_type)
+    if module_name is None:
+        st.error(f"Unknown equipment type: {equipment_type}")
+        return False
+    
+    # Run the downloader's main() in this process instead of starting a new interpreter.
+    # The downloaders import their shared helpers as siblings, so the modules directory
+    # goes on the path like scripts/refresh_all.py does. They write into the directory the
+    # app reads from rather than the working directory; their progress output goes to the
+    # server log, since sys.stdout is shared by every session's thread.
+    modules_dir = str(BASE_DIR / "modules")
+    if modules_dir not in sys.path:
+        sys.path.insert(0, modules_dir)
     try:
-        # Determine which script to run based on equipment type
-        if equipment_type == "PV Modules":
-            script_path = str(BASE_DIR / "modules" / "pv_module_downloader.py")
-        elif equipment_type == "Grid Support Inverter List":
-            script_path = str(BASE_DIR / "inverters" / "inverter_downloader.py")
-        elif equipment_type == "Energy Storage Systems":
-            script_path = str(BASE_DIR / "storage" / "energy_storage_downloader.py")
-        elif equipment_type == "Batteries":
-            script_path = str(BASE_DIR / "batteries" / "battery_downloader.py")
-        elif equipment_type == "Meters":
-            script_path = str(BASE_DIR / "meters" / "meter_downloader.py")
-        else:
-            st.error(f"Unknown equipment type: {equipment_type}")
-            return False
-        
-        # Check if the script exists
-        if not os.path.exists(script_path):
-            st.error(f"Downloader script not found: {script_path}")
-            return False
-        
-        # Run the script using subprocess with the correct Python executable
-        python_executable = sys.executable
-        result = subprocess.run([python_executable, script_path], 
-                              capture_output=True, 
-                              text=True, 
-                              check=False)
-        
-        if result.returncode == 0:
-            st.success(f"Successfully updated {equipment_type} database.")
-            # Clear cache to force reload of data
-            st.cache_data.clear()
-            return True
-        else:
-            st.error(f"Error updating {equipment_type} database: {result.stderr}")
-            with st.expander("View Error Details"):
-                st.code(result.stderr)
-            return False
+        downloader = importlib.import_module(module_name)
+        downloader.main(data_dir=str(BASE_DIR / "db"))
     except Exception as e:
-        st.error(f"Error running downloader: {str(e)}")
+        st.error(f"Error updating {equipment_type} database: {e}")
+        with st.expander("View Error Details"):
+            st.code(traceback.format_exc())
         return False
+    
+    st.success(f"Successfully updated {equipment_type} database.")
+    # Reopen the connections in case the downloader replaced a database file
+    get_conn.clear()
+    # The rewritten files give this equipment type a new data version, so only it reloads
+    return True
 
 # Function to display equipment data with consistent formatting
-def display_equipment_data(equipment_type, df, id_column, manufacturer_column, model_column, efficiency_column, power_column):
+def display_equipment_data(equipment_type, df, id_column, manufacturer_column, model_column, efficiency_column, power_column, filtered_loader=None):
     
-    # Display statistics in a consistent format
-    # Determine which date column to use based on equipment type
-    date_column = None
-    if equipment_type == "PV Modules":
-        date_column = 'CEC Listing Date'
-    elif equipment_type == "Grid Support Inverter List":
-        date_column = 'Grid Support Listing Date'
-    elif equipment_type == "Energy Storage Systems":
-        date_column = 'Energy Storage Listing Date'
-    elif equipment_type == "Batteries":
-        date_column = 'Battery Listing Date'
-    elif equipment_type == "Meters":
-        date_column = 'Meter Listing Date'
-    
-    # Handle the date formatting safely
-    latest_listing_date = "N/A"
-    if date_column and date_column in df.columns and not df.empty:
-        try:
-            # Filter out None, 'None', and empty values before finding max date
-            valid_dates = df[df[date_column].notna() & 
-                             (df[date_column].astype(str) != 'None') & 
-                             (df[date_column].astype(str) != '')][date_column]
-            
-            if not valid_dates.empty:
-                max_date = valid_dates.max()
-                if isinstance(max_date, str) and len(max_date) > 0:
-                    # If it contains time, just take the date part
-                    if ' ' in max_date:
-                        latest_listing_date = max_date.split(' ')[0]
-                    else:
-                        latest_listing_date = max_date
-                else:
-                    latest_listing_date = str(max_date) if max_date else "N/A"
-            else:
-                latest_listing_date = "N/A"
-        except Exception as e:
-            print(f"Error processing dates: {e}")
-            latest_listing_date = "N/A"
+    # Stats and filter options are computed once per cached load rather than on every rerun
+    meta = load_equipment_meta(equipment_type, manufacturer_column, efficiency_column, get_data_version(equipment_type))
     
     # Format the label based on equipment type
     date_label = "Latest Listing Date"
@@ -334,9 +642,9 @@ def display_equipment_data(equipment_type, df, id_column, manufacturer_column, m
     </div>
     """.format(
         len(df), 
-        df[manufacturer_column].nunique(),
+        meta['manufacturer_count'],
         date_label,
-        latest_listing_date
+        load_latest_listing_date(equipment_type, get_data_version(equipment_type))
     ), unsafe_allow_html=True)
     
     # Display filtered data
@@ -349,7 +657,7 @@ def display_equipment_data(equipment_type, df, id_column, manufacturer_column, m
     with filter_col:
         with st.expander("Add Filters Here"):
             # Filter by manufacturer
-            manufacturers = ["All"] + sorted(df[manufacturer_column].unique().tolist())
+            manufacturers = ["All", *meta['manufacturers']]
             selected_manufacturer = st.selectbox(
                 "Manufacturer", 
                 manufacturers,
@@ -357,10 +665,11 @@ def display_equipment_data(equipment_type, df, id_column, manufacturer_column, m
             )
             
             # Filter by efficiency if available
+            efficiency_range = None
             if efficiency_column in df.columns:
                 try:
-                    min_efficiency = float(df[efficiency_column].min())
-                    max_efficiency = float(df[efficiency_column].max())
+                    # Unpacking raises TypeError for a column the meta marked as non-numeric
+                    min_efficiency, max_efficiency = meta['efficiency_ranges'][efficiency_column]
                     efficiency_range = st.slider(
                         f"Efficiency (%)",
                         min_efficiency,
@@ -385,9 +694,15 @@ def display_equipment_data(equipment_type, df, id_column, manufacturer_column, m
             # Apply search if provided
             if tab_search_query:
                 try:
-                    # Handle potential errors in string operations
-                    search_results = df[df[manufacturer_column].astype(str).str.contains(tab_search_query, case=False, na=False) | 
-                                      df[model_column].astype(str).str.contains(tab_search_query, case=False, na=False)]
+                    # Case-insensitive substring match on either column
+                    manufacturer_keys, model_keys = get_search_keys(df, equipment_type, manufacturer_column, model_column)
+                    needle = tab_search_query.lower()
+                    matches = np.fromiter(
+                        ((needle in manufacturer) or (needle in model) for manufacturer, model in zip(manufacturer_keys, model_keys)),
+                        dtype=bool,
+                        count=len(manufacturer_keys)
+                    )
+                    search_results = df[matches]
                     
                     # Only update df if we found results
                     if not search_results.empty:
@@ -403,7 +718,7 @@ def display_equipment_data(equipment_type, df, id_column, manufacturer_column, m
     if st.button("⟳", key=f"refresh_button_{equipment_type}", help="Download latest data and refresh"):
         # Set downloading state
         st.session_state[f"downloading_{equipment_type}"] = True
-        st.rerun()
+        rerun_tab()
     
     # Show downloading spinner below refresh button if downloading
     if st.session_state.get(f"downloading_{equipment_type}", False):
@@ -413,29 +728,33 @@ def display_equipment_data(equipment_type, df, id_column, manufacturer_column, m
             # Clear downloading state
             st.session_state[f"downloading_{equipment_type}"] = False
             if success:
-                # Clear cache and reload the app
-                st.cache_data.clear()
-                st.rerun()
+                # The download gave this tab a new data version; reload it
+                rerun_tab()
     
     st.write(f"Showing {len(df)} items")
     
-    # Apply filters
-    filtered_df = df.copy()
-    
-    if selected_manufacturer != "All":
-        filtered_df = filtered_df[filtered_df[manufacturer_column] == selected_manufacturer]
-    
-    if efficiency_column and efficiency_column in df.columns:
-        try:
-            filtered_df = filtered_df[
-                (filtered_df[efficiency_column].astype(float) >= efficiency_range[0]) &
-                (filtered_df[efficiency_column].astype(float) <= efficiency_range[1])
-            ]
-        except (ValueError, TypeError):
-            st.warning(f"Could not apply {efficiency_column} filter due to data type issues.")
+    if filtered_loader is not None and selected_manufacturer != "All" and not tab_search_query:
+        # Let SQLite pick out the manufacturer's rows through its index
+        filtered_df = filtered_loader(selected_manufacturer, efficiency_column, efficiency_range, get_data_version(equipment_type))
+    else:
+        # Apply filters as one combined mask, indexing df only once
+        mask = np.ones(len(df), dtype=bool)
+        
+        if selected_manufacturer != "All":
+            mask &= (df[manufacturer_column].values == selected_manufacturer)
+        
+        if efficiency_column and efficiency_column in df.columns:
+            try:
+                efficiency = df[efficiency_column].to_numpy(dtype=float)
+                mask &= (efficiency >= efficiency_range[0]) & (efficiency <= efficiency_range[1])
+            except (ValueError, TypeError):
+                st.warning(f"Could not apply {efficiency_column} filter due to data type issues.")
+        
+        filtered_df = df if mask.all() else df.loc[mask]
     
-    # Select columns to display
-    all_columns = df.columns.tolist()
+    # Select columns to display; columns outside the initial load are fetched when picked
+    db_name, table = EQUIPMENT_TABLES[equipment_type]
+    all_columns = [name for name, _ in get_table_columns(db_name, table, get_data_version(equipment_type))] or df.columns.tolist()
     default_columns = [id_column, manufacturer_column, model_column]
     
     # Add equipment-specific columns to defaults
@@ -466,120 +785,12 @@ def display_equipment_data(equipment_type, df, id_column, manufacturer_column, m
     )
     
     if selected_columns:
-        st.dataframe(filtered_df[selected_columns], use_container_width=True)
+        st.dataframe(with_columns(filtered_df, equipment_type, id_column, selected_columns), use_container_width=True)
     else:
         st.dataframe(filtered_df, use_container_width=True)
     
     return filtered_df
 
-# PV Modules Tab
-with tab1:
-    # Load PV module data
-    with st.spinner("Loading PV Modules data..."):
-        df_pv = load_pv_data()
-        filtered_df_pv = display_equipment_data(
-            "PV Modules",
-            df_pv,
-            'module_id',
-            'Manufacturer',
-            'Model Number',
-            'PTC Efficiency (%)',
-            'Power Rating (W)'
-        )
-
-# Grid Support Inverter List Tab
-with tab2:
-    # Load Grid Support Inverter data
-    with st.spinner("Loading Grid Support Inverter List data..."):
-        try:
-            df_inv = load_inverter_data()
-            filtered_df_inv = display_equipment_data(
-                "Grid Support Inverter List",
-                df_inv,
-                'inverter_id',
-                'Manufacturer Name',
-                'Model Number1',
-                'CEC Weighted Efficiency (%)',
-                'Rated Output Power (kW)'
-            )
-        except Exception as e:
-            st.error(f"Error loading inverter data: {e}")
-
-# Energy Storage Systems Tab
-with tab3:
-    # Load Energy Storage Systems data
-    with st.spinner("Loading Energy Storage Systems data..."):
-        try:
-            df_storage = load_energy_storage_data()
-            filtered_df_storage = display_equipment_data(
-                "Energy Storage Systems",
-                df_storage,
-                'storage_id',
-                'Manufacturer',
-                'Model Number',
-                'Round Trip Efficiency (%)',
-                'Maximum Discharge Rate (kW)'
-            )
-        except Exception as e:
-            st.error(f"Error loading energy storage data: {e}")
-            st.info("To download Energy Storage Systems data, click the refresh button in the top right corner.")
-            
-            # Add a button to run the downloader script directly if no data is available
-            if st.button("Download Energy Storage Data"):
-                success = run_downloader("Energy Storage Systems")
-                if success:
-                    st.experimental_rerun()
-
-# Batteries Tab
-with tab4:
-    # Load Batteries data
-    with st.spinner("Loading Batteries data..."):
-        try:
-            df_battery = load_battery_data()
-            filtered_df_battery = display_equipment_data(
-                "Batteries",
-                df_battery,
-                'battery_id',
-                'Manufacturer',
-                'Model Number',
-                'Round Trip Efficiency (%)',
-                'Discharge Rate (kW)'
-            )
-        except Exception as e:
-            st.error(f"Error loading battery data: {e}")
-            st.info("To download Batteries data, click the refresh button in the top right corner.")
-            
-            # Add a button to run the downloader script directly if no data is available
-            if st.button("Download Batteries Data"):
-                success = run_downloader("Batteries")
-                if success:
-                    st.experimental_rerun()
-
-# Meters Tab
-with tab5:
-    # Load Meters data
-    with st.spinner("Loading Meters data..."):
-        try:
-            df_meter = load_meter_data()
-            filtered_df_meter = display_equipment_data(
-                "Meters",
-                df_meter,
-                'meter_id',
-                'Manufacturer',
-                'Model Number',
-                'Display Type',
-                'PBI Meter'
-            )
-        except Exception as e:
-            st.error(f"Error loading meter data: {e}")
-            st.info("To download Meters data, click the refresh button in the top right corner.")
-            
-            # Add a button to run the downloader script directly if no data is available
-            if st.button("Download Meters Data"):
-                success = run_downloader("Meters")
-                if success:
-                    st.experimental_rerun()
-
 # Add visualization section to each tab
 def display_visualizations(filtered_df, equipment_type, manufacturer_column, efficiency_column, power_column):
     st.subheader("Data Visualization")
@@ -591,79 +802,23 @@ def display_visualizations(filtered_df, equipment_type, manufacturer_column, eff
     )
     
     if chart_type == "Manufacturer Distribution":
-        # Group manufacturers by count
-        manufacturer_counts = filtered_df[manufacturer_column].value_counts().reset_index()
-        manufacturer_counts.columns = ['Manufacturer', 'Count']
-        
-        # Calculate percentage
-        total = manufacturer_counts['Count'].sum()
-        manufacturer_counts['Percentage'] = (manufacturer_counts['Count'] / total * 100).round(1)
-        
-        # Keep only top 10 manufacturers, group others
-        top_n = 10
-        if len(manufacturer_counts) > top_n:
-            top_manufacturers = manufacturer_counts.head(top_n).copy()
-            other_count = manufacturer_counts.iloc[top_n:]['Count'].sum()
-            other_percentage = manufacturer_counts.iloc[top_n:]['Percentage'].sum()
-            
-            # Add "Other" category
-            other_row = pd.DataFrame({
-                'Manufacturer': ['Other'],
-                'Count': [other_count],
-                'Percentage': [other_percentage.round(1)]
-            })
-            
-            manufacturer_counts = pd.concat([top_manufacturers, other_row])
-        
-        # Sort by percentage descending
-        manufacturer_counts = manufacturer_counts.sort_values('Percentage', ascending=True)
-        
-        # Create a custom color palette - distinct colors for top categories, gray for "Other"
-        colors = px.colors.qualitative.Bold[:top_n]
-        if len(manufacturer_counts) > top_n:
-            colors.append('#CCCCCC')  # Gray for "Other"
-        
-        # Create horizontal bar chart
-        fig = px.bar(
-            manufacturer_counts,
-            y='Manufacturer',
-            x='Percentage',
-            title=f'Share of {equipment_type} by Manufacturer (%)',
-            color='Manufacturer',
-            color_discrete_sequence=colors,
-            text='Percentage',
-            orientation='h',
-            height=500
-        )
-        
-        # Improve layout
-        fig.update_traces(texttemplate='%{text}%', textposition='outside')
-        fig.update_layout(
-            xaxis_title='Market Share (%)',
-            yaxis_title='Manufacturer',
-            showlegend=False,
-            margin=dict(l=20, r=20, t=40, b=20),
-            xaxis=dict(range=[0, max(manufacturer_counts['Percentage']) * 1.15])  # Add space for labels
-        )
-        
+        # Group manufacturers by count; the top 10 are charted and the rest grouped as "Other"
+        manufacturer_counts = filtered_df[manufacturer_column].value_counts()
+        fig = manufacturer_share_figure(manufacturer_counts, equipment_type, top_n=10)
         st.plotly_chart(fig, use_container_width=True)
     
     elif chart_type == "Efficiency Comparison" and efficiency_column in filtered_df.columns:
         try:
-            fig = px.box(
+            fig = box_summary_figure(
                 filtered_df,
-                x=manufacturer_column,
-                y=efficiency_column,
-                title=f'Efficiency Comparison by Manufacturer',
-                color=manufacturer_column,
-                color_discrete_sequence=px.colors.qualitative.Bold,
-                height=500
+                manufacturer_column,
+                efficiency_column,
+                f'Efficiency Comparison by Manufacturer'
             )
             fig.update_layout(
                 xaxis_title='Manufacturer',
                 yaxis_title='Efficiency (%)',
-                showlegend=False,
-                xaxis={'categoryorder':'total descending'}
+                showlegend=False
             )
             st.plotly_chart(fig, use_container_width=True)
         except Exception as e:
@@ -671,20 +826,16 @@ def display_visualizations(filtered_df, equipment_type, manufacturer_column, eff
     
     elif chart_type == "Power Comparison" and power_column in filtered_df.columns:
         try:
-            fig = px.box(
+            fig = box_summary_figure(
                 filtered_df,
-                x=manufacturer_column,
-                y=power_column,
-                title=f'Power Rating Comparison by Manufacturer',
-                color=manufacturer_column,
-                color_discrete_sequence=px.colors.qualitative.Bold,
-                height=500
+                manufacturer_column,
+                power_column,
+                f'Power Rating Comparison by Manufacturer'
             )
             fig.update_layout(
                 xaxis_title='Manufacturer',
                 yaxis_title='Power Rating',
-                showlegend=False,
-                xaxis={'categoryorder':'total descending'}
+                showlegend=False
             )
             st.plotly_chart(fig, use_container_width=True)
         except Exception as e:
@@ -693,31 +844,51 @@ def display_visualizations(filtered_df, equipment_type, manufacturer_column, eff
     # Correlation plots are now a separate visualization type
 
 # Function to display correlation plots as a separate visualization type
-def display_correlation_plots(filtered_df, equipment_type, manufacturer_column):
+def display_correlation_plots(filtered_df, equipment_type, manufacturer_column, meta=None):
     st.subheader("Correlation Analysis")
     
     # Select only numeric columns for correlation
-    numeric_cols = filtered_df.select_dtypes(include=['float64', 'int64']).columns.tolist()
+    if meta:
+        numeric_cols = list(meta['numeric_cols'])
+    else:
+        numeric_cols = filtered_df.select_dtypes(include=['float64', 'int64']).columns.tolist()
     
     if len(numeric_cols) >= 2:
         # Add unique keys for each axis selectbox based on equipment_type
         x_axis = st.selectbox("X-axis", numeric_cols, index=0, key=f"corr_x_axis_{equipment_type}")
         y_axis = st.selectbox("Y-axis", numeric_cols, index=min(1, len(numeric_cols)-1), key=f"corr_y_axis_{equipment_type}")
         
-        fig = px.scatter(
-            filtered_df,
-            x=x_axis,
-            y=y_axis,
-            color=manufacturer_column,
-            title=f'{y_axis} vs {x_axis}',
-            color_discrete_sequence=px.colors.qualitative.Bold,
-            height=500
-        )
+        # Large selections are binned so the browser draws cells rather than every point
+        use_heatmap = len(filtered_df) > MAX_SCATTER_POINTS
+        if use_heatmap:
+            fig = px.density_heatmap(
+                filtered_df,
+                x=x_axis,
+                y=y_axis,
+                nbinsx=60,
+                nbinsy=60,
+                title=f'{y_axis} vs {x_axis}',
+                height=500
+            )
+        else:
+            fig = px.scatter(
+                filtered_df,
+                x=x_axis,
+                y=y_axis,
+                # Plain strings for the color groups; plotly's own groupby warns on categorical columns
+                color=filtered_df[manufacturer_column].astype(str),
+                labels={'color': manufacturer_column},
+                title=f'{y_axis} vs {x_axis}',
+                color_discrete_sequence=CHART_COLORS,
+                height=500,
+                render_mode='webgl'
+            )
         
         # Add trendline option
         add_trendline = st.checkbox("Add trendline", key=f"trendline_{equipment_type}")
         if add_trendline:
-            fig.update_traces(mode='markers')
+            if not use_heatmap:
+                fig.update_traces(mode='markers')
             fig.update_layout(
                 shapes=[
                     dict(
@@ -741,92 +912,6 @@ def display_correlation_plots(filtered_df, equipment_type, manufacturer_column):
     else:
         st.warning("Not enough numeric columns available for correlation plot.")
 
-# Update the tab content to include visualizations
-with tab1:
-    # Add visualization section for PV Modules
-    display_visualizations(
-        filtered_df_pv,
-        "PV Modules",
-        'Manufacturer',
-        'PTC Efficiency (%)',
-        'Power Rating (W)'
-    )
-    
-    # Add correlation plots section
-    display_correlation_plots(
-        filtered_df_pv,
-        "PV Modules",
-        'Manufacturer'
-    )
-
-with tab2:
-    # Add visualization section for Grid Support Inverter List
-    display_visualizations(
-        filtered_df_inv,
-        "Grid Support Inverter List",
-        'Manufacturer Name',
-        'Weighted Efficiency (%)',
-        'Maximum Continuous Output Power at Unity Power Factor ((kW))'
-    )
-    
-    # Add correlation plots section
-    display_correlation_plots(
-        filtered_df_inv,
-        "Grid Support Inverter List",
-        'Manufacturer Name'
-    )
-
-with tab3:
-    # Add visualization section for Energy Storage Systems
-    display_visualizations(
-        filtered_df_storage,
-        "Energy Storage Systems",
-        'Manufacturer',
-        'Chemistry',
-        'Maximum Discharge Rate (kW)'
-    )
-    
-    # Add correlation plots section
-    display_correlation_plots(
-        filtered_df_storage,
-        "Energy Storage Systems",
-        'Manufacturer'
-    )
-
-with tab4:
-    # Add visualization section for Batteries
-    display_visualizations(
-        filtered_df_battery,
-        "Batteries",
-        'Manufacturer',
-        'Round Trip Efficiency (%)',
-        'Discharge Rate (kW)'
-    )
-    
-    # Add correlation plots section
-    display_correlation_plots(
-        filtered_df_battery,
-        "Batteries",
-        'Manufacturer'
-    )
-
-with tab5:
-    # Add visualization section for Meters
-    display_visualizations(
-        filtered_df_meter,
-        "Meters",
-        'Manufacturer',
-        'Display Type',
-        'PBI Meter'
-    )
-    
-    # Add correlation plots section
-    display_correlation_plots(
-        filtered_df_meter,
-        "Meters",
-        'Manufacturer'
-    )
-
 # Add equipment comparison functionality to each tab
 def display_comparison(filtered_df, equipment_type, id_column):
     st.subheader(f"{equipment_type} Comparison")
@@ -844,6 +929,10 @@ def display_comparison(filtered_df, equipment_type, id_column):
         
         if selected_equipment:
             comparison_df = filtered_df[filtered_df[id_column].isin(selected_equipment)]
+            # Compare every column, not just the ones loaded for the table view
+            db_name, table = EQUIPMENT_TABLES[equipment_type]
+            all_columns = [name for name, _ in get_table_columns(db_name, table, get_data_version(equipment_type))]
+            comparison_df = with_columns(comparison_df, equipment_type, id_column, all_columns or comparison_df.columns.tolist())
             
             # Transpose the dataframe for side-by-side comparison
             comparison_df = comparison_df.set_index(id_column).T
@@ -852,26 +941,143 @@ def display_comparison(filtered_df, equipment_type, id_column):
     else:
         st.info(f"Apply filters to see more {equipment_type.lower()} for comparison.")
 
-# Update the tab content to include comparisons
+# Function to render the charts and comparison for a tab's filtered rows. As a nested fragment,
+# changing a chart or comparison widget reruns only this part and keeps the filtered rows from the
+# last tab run instead of filtering the table again.
+@tab_fragment
+def render_equipment_charts(filtered_df, equipment_type, id_column, manufacturer_column,
+                            efficiency_column, power_column, meta):
+    # Add visualization section
+    display_visualizations(
+        filtered_df,
+        equipment_type,
+        manufacturer_column,
+        efficiency_column,
+        power_column
+    )
+    
+    # Add correlation plots section
+    display_correlation_plots(
+        filtered_df,
+        equipment_type,
+        manufacturer_column,
+        meta=meta
+    )
+    
+    # Add comparison section
+    display_comparison(filtered_df, equipment_type, id_column)
+
+# Function to render one equipment tab: the table, charts and comparison
+@tab_fragment
+def render_equipment_tab(equipment_type, loader, id_column, manufacturer_column, model_column,
+                         efficiency_column, power_column, chart_efficiency_column, chart_power_column,
+                         filtered_loader=None):
+    version = get_data_version(equipment_type)
+    with st.spinner(f"Loading {equipment_type} data..."):
+        try:
+            df = loader(version)
+            filtered_df = display_equipment_data(
+                equipment_type,
+                df,
+                id_column,
+                manufacturer_column,
+                model_column,
+                efficiency_column,
+                power_column,
+                filtered_loader=filtered_loader
+            )
+        except Exception as e:
+            st.error(f"Error loading {equipment_type} data: {e}")
+            st.info(f"To download {equipment_type} data, click the refresh button in the top right corner.")
+            
+            # Add a button to run the downloader script directly if no data is available
+            if st.button(f"Download {equipment_type} Data"):
+                success = run_downloader(equipment_type)
+                if success:
+                    rerun_tab()
+            return
+    
+    render_equipment_charts(
+        filtered_df,
+        equipment_type,
+        id_column,
+        manufacturer_column,
+        chart_efficiency_column,
+        chart_power_column,
+        load_equipment_meta(equipment_type, manufacturer_column, efficiency_column, version)
+    )
+
+# PV Modules Tab
 with tab1:
-    # Add comparison section for PV Modules
-    display_comparison(filtered_df_pv, "PV Modules", 'module_id')
+    render_equipment_tab(
+        "PV Modules",
+        load_pv_data,
+        'module_id',
+        'Manufacturer',
+        'Model Number',
+        'PTC Efficiency (%)',
+        'Power Rating (W)',
+        'PTC Efficiency (%)',
+        'Power Rating (W)'
+    )
 
+# Grid Support Inverter List Tab
 with tab2:
-    # Add comparison section for Grid Support Inverter List
-    display_comparison(filtered_df_inv, "Grid Support Inverter List", 'inverter_id')
+    render_equipment_tab(
+        "Grid Support Inverter List",
+        load_inverter_data,
+        'inverter_id',
+        'Manufacturer Name',
+        'Model Number1',
+        'CEC Weighted Efficiency (%)',
+        'Rated Output Power (kW)',
+        'Weighted Efficiency (%)',
+        'Maximum Continuous Output Power at Unity Power Factor ((kW))',
+        filtered_loader=load_filtered_inverter_data
+    )
 
+# Energy Storage Systems Tab
 with tab3:
-    # Add comparison section for Energy Storage Systems
-    display_comparison(filtered_df_storage, "Energy Storage Systems", 'storage_id')
+    render_equipment_tab(
+        "Energy Storage Systems",
+        load_energy_storage_data,
+        'storage_id',
+        'Manufacturer',
+        'Model Number',
+        'Round Trip Efficiency (%)',
+        'Maximum Discharge Rate (kW)',
+        'Chemistry',
+        'Maximum Discharge Rate (kW)',
+        filtered_loader=load_filtered_energy_storage_data
+    )
 
+# Batteries Tab
 with tab4:
-    # Add comparison section for Batteries
-    display_comparison(filtered_df_battery, "Batteries", 'battery_id')
+    render_equipment_tab(
+        "Batteries",
+        load_battery_data,
+        'battery_id',
+        'Manufacturer',
+        'Model Number',
+        'Round Trip Efficiency (%)',
+        'Discharge Rate (kW)',
+        'Round Trip Efficiency (%)',
+        'Discharge Rate (kW)'
+    )
 
+# Meters Tab
 with tab5:
-    # Add comparison section for Meters
-    display_comparison(filtered_df_meter, "Meters", 'meter_id')
+    render_equipment_tab(
+        "Meters",
+        load_meter_data,
+        'meter_id',
+        'Manufacturer',
+        'Model Number',
+        'Display Type',
+        'PBI Meter',
+        'Display Type',
+        'PBI Meter'
+    )
 
 # Footer
 st.markdown("---")
@@ -7,11 +7,11 @@ to prevent the 'coroutine was never awaited' warnings.
 import os
 import sys
 import warnings
-import subprocess
 
 # Filter warnings at the Python level
 warnings.filterwarnings("ignore", category=RuntimeWarning, message="coroutine.*never awaited")
 warnings.filterwarnings("ignore", category=RuntimeWarning, message="Enable tracemalloc.*")
+warnings.filterwarnings("ignore", category=RuntimeWarning, module="asyncio")
 
 # Disable asyncio debug mode via environment variables
 os.environ["PYTHONWARNINGS"] = "ignore::RuntimeWarning:asyncio"
@@ -20,24 +20,13 @@ def main():
     """Run the Streamlit app with warning filters applied."""
     print("Starting Solar Equipment Explorer with warning filters...")
     
-    # Get the Python executable path
-    python_exe = sys.executable
-    
-    # Construct the command to run streamlit with the warning filter
-    cmd = [
-        python_exe, 
-        "-W", "ignore::RuntimeWarning:asyncio",
-        "-m", "streamlit", 
-        "run", 
-        "solar_explorer.py"
-    ]
-    
+    # Run Streamlit's command line entry point in this interpreter, so the warning filters
+    # above apply directly and pandas/streamlit are only imported once
+    from streamlit.web.cli import main as streamlit_main
+
     # Add any command line arguments passed to this script
-    if len(sys.argv) > 1:
-        cmd.extend(sys.argv[1:])
-    
-    # Run the Streamlit app with warning filters
-    subprocess.run(cmd)
+    sys.argv = ["streamlit", "run", "solar_explorer.py", *sys.argv[1:]]
+    sys.exit(streamlit_main())
 
 if __name__ == "__main__":
     main()
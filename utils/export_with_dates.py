@@ -1,14 +1,17 @@
 import sqlite3
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import os
-from datetime import datetime
+from dateutil.tz import tzlocal
 
 # Connect to the SQLite database
 conn = sqlite3.connect('pv_modules.db')
 
 # Execute a SELECT * LIMIT 100 query
 query = "SELECT * FROM pv_modules LIMIT 100"
-df = pd.read_sql_query(query, conn)
+# Read straight into Arrow-backed columns so the CSV writer below can use them without copying
+df = pd.read_sql_query(query, conn, dtype_backend='pyarrow')
 
 # Identify date columns (based on column names)
 date_columns = ['CEC Listing Date', 'Last Update']
@@ -16,15 +19,15 @@ date_columns = ['CEC Listing Date', 'Last Update']
 # Convert Unix timestamps to readable datetime format
 for col in date_columns:
     if col in df.columns:
-        # Convert only non-null values
-        df[col] = df[col].apply(
-            lambda x: datetime.fromtimestamp(int(x)).strftime('%Y-%m-%d %H:%M:%S') 
-            if pd.notna(x) and str(x).strip() != "" else x
-        )
+        # Convert the whole column at once, in local time like datetime.fromtimestamp;
+        # values that aren't timestamps (blanks, already formatted dates) are kept as they are
+        seconds = pd.to_numeric(df[col], errors='coerce')
+        converted = pd.to_datetime(seconds, unit='s', utc=True).dt.tz_convert(tzlocal())
+        df[col] = converted.dt.strftime('%Y-%m-%d %H:%M:%S').where(seconds.notna(), df[col])
 
-# Export to CSV
+# Export to CSV with Arrow's multi-threaded writer instead of pandas' Python one
 output_file = 'sample_query_with_dates.csv'
-df.to_csv(output_file, index=False)
+pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), output_file)
 
 # Close the connection
 conn.close()
@@ -22,11 +22,12 @@ def list_db_columns():
             cid, name, type_name, notnull, default_value, pk = col
             print(f"{cid:<6} {name:<40} {type_name:<10} {'Yes' if pk else 'No':<12}")
         
-        # Also get a sample row to verify data
-        cursor.execute("SELECT * FROM pv_modules LIMIT 1")
-        sample = cursor.fetchone()
-        if sample:
-            print("\nSample data available. Number of fields in first row:", len(sample))
+        # Also count the rows to verify data; the field count comes from table_info above,
+        # so no row has to be read and decoded
+        cursor.execute("SELECT COUNT(*) FROM pv_modules")
+        (row_count,) = cursor.fetchone()
+        if row_count:
+            print(f"\nSample data available. {row_count} rows with {len(columns)} fields each.")
         else:
             print("\nNo data found in the table.")
             